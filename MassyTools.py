@@ -33,6 +33,7 @@ from tkinter import filedialog, messagebox
 # Application Specific Imports
 import MassyTools.gui.version as version
 import MassyTools.util.requirement_checker as req_check
+import MassyTools.util.baseline as baseline
 import MassyTools.util.functions as functions
 import MassyTools.util.classification as classification
 from MassyTools.gui.batch_window import BatchWindow
@@ -42,6 +43,7 @@ from MassyTools.gui.settings_window import SettingsWindow
 from MassyTools.gui.experimental_settings_window import ExperimentalSettingsWindow
 from MassyTools.gui.about_window import AboutWindow
 from MassyTools.gui.cite_window import CiteWindow
+from MassyTools.bin.isotope_pattern_cache import IsotopePatternCache
 from MassyTools.bin.mass_spectrum import MassSpectrum, finalize_plot
 from MassyTools.bin.output import Output
 from MassyTools.bin.process_parameters import ProcessParameters
@@ -185,7 +187,9 @@ class MassyToolsGui(object):
         self.base_dir = Path.cwd()
         self.settings = Settings()
         self.process_parameters = ProcessParameters()
-        self.output_parameters = OutputParameters()
+        self.output_parameters = OutputParameters(tk.IntVar)
+        self.isotope_cache = IsotopePatternCache(
+                self.building_blocks, self.settings.isotope_library)
         self.axes = axes
         self.canvas = canvas
         self.progress = progress
@@ -209,13 +213,21 @@ class MassyToolsGui(object):
             self.progress.reset_bar()
             self.task_label.set('Baseline Correcting Mass Spectra')
 
-            for index, mass_spectrum in enumerate(self.mass_spectra):
-                mass_spectrum.baseline_correct()
-                mass_spectrum.plot_mass_spectrum()
+            data = [(mass_spectrum.x_data, mass_spectrum.y_data) for
+                    mass_spectrum in self.mass_spectra]
+            for count, (index, y_data) in enumerate(
+                    baseline.correct_baselines(
+                        data, self.settings.baseline_method,
+                        self.settings.baseline_window,
+                        self.settings.baseline_processes)):
+                self.mass_spectra[index].y_data = y_data
                 self.progress.counter.set(
-                    (float(index) / len(self.mass_spectra))*100)
+                    (float(count) / len(self.mass_spectra))*100)
                 self.progress.update_progress_bar()
 
+            for mass_spectrum in self.mass_spectra:
+                mass_spectrum.plot_mass_spectrum()
+
             self.task_label.set('Idle')
             self.progress.fill_bar()
 
@@ -274,6 +286,7 @@ class MassyToolsGui(object):
             self.logger.error(e)
 
     def close(self):
+        self.isotope_cache.save_library()
         self.master.destroy()
         self.master.quit()
 
@@ -416,29 +429,8 @@ class MassyToolsGui(object):
             self.logger.error(e)
 
     def read_building_blocks(self):
-        building_blocks = {}
-        block_folder = Path.cwd() / 'blocks'
-        for file in block_folder.glob('*.block'):
-            block = Path(file).stem
-            keys = []
-            values = []
-            with open(file, 'r') as fr:
-                for line in fr:
-                    foo = line.rstrip().split()
-                    key = foo[0]
-                    value = " ".join(foo[1:])
-                    keys.append(key)
-                    try:
-                        float(value)
-                        try:
-                            value = int(value)
-                        except ValueError:
-                            value = float(value)
-                    except ValueError:
-                        value = str(value)
-                    values.append(value)
-            building_blocks[block] = dict(zip(keys, values))
-        self.building_blocks = building_blocks
+        self.building_blocks = functions.read_building_blocks(
+                Path.cwd() / 'blocks')
 
     def save_mass_spectrum(self):
         try:
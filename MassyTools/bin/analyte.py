@@ -1,8 +1,5 @@
-import itertools
 import logging
-import sys
 import numpy as np
-from bisect import bisect_left, bisect_right
 from operator import itemgetter
 import MassyTools.util.functions as functions
 import MassyTools.bin.elemental_abundances as elemental_abundances
@@ -19,7 +16,8 @@ class Analyte(object):
 
         self.name = master.peak['name']
         self.charge = master.charge
-        self.data_subset = None
+        self.left_index = None
+        self.right_index = None
         self.distributions = None
         self.isotopic_pattern = None
         self.background_area = None
@@ -27,20 +25,29 @@ class Analyte(object):
         self.noise = None
         self.isotopes = []
 
-    def inherit_data_subset(self):
-        mass_window = self.settings.background_window+self.settings.mass_window
+    @property
+    def x_data(self):
+        return self.master.x_data[self.left_index:self.right_index]
 
-        x_data, y_data = zip(*self.master.data)
-        max_fraction = max(isotope.fraction for isotope in self.isotopes)
-        for isotope in self.isotopes:
-            if isotope.fraction == max_fraction and isotope.charge == self.charge:
-                center_mass = isotope.exact_mass
-        left_border = bisect_left(x_data, center_mass-mass_window)
-        right_border = bisect_right(x_data, center_mass+mass_window)
-        self.data_subset = list(zip(x_data[left_border:right_border],
-                                y_data[left_border:right_border]))
+    @property
+    def y_data(self):
+        return self.master.y_data[self.left_index:self.right_index]
 
     def calculate_isotopes(self):
+        self.isotopic_pattern = (self.master.isotope_cache.
+                                 get_isotopic_pattern(self))
+        self.attach_isotopes()
+
+    def calculate_isotopic_pattern(self, neutral_distribution=None):
+        if neutral_distribution is None:
+            neutral_distribution = self.calculate_neutral_distribution()
+        self.attach_charge_carriers(neutral_distribution)
+        self.merge_isotopic_pattern()
+        self.sort_isotopic_pattern()
+
+    def calculate_neutral_distribution(self):
+        """Return the mass, element counts and distribution without carriers.
+        """
         self.mass = 0.
         self.number_carbons = 0
         self.number_hydrogens = 0
@@ -53,69 +60,42 @@ class Analyte(object):
 
         self.determine_total_number_of_elements()
         self.attach_mass_modifiers()
-        self.calculate_analyte_isotopic_pattern()
+        counts = (self.number_carbons, self.number_hydrogens,
+                  self.number_nitrogens, self.number_oxygens,
+                  self.number_sulfurs)
+        distribution = None
+        if not any(self.get_charge_carrier_counts()):
+            self.calculate_elemental_distributions(*counts)
+            distribution = self.combine_distributions()
+        return self.mass, counts, distribution
 
     def determine_total_number_of_elements(self):
-        units = ["".join(x) for _, x in itertools.groupby(self.name,
-                                                          key=str.isalpha)]
-        for index, unit in enumerate(units):
-            for block in self.building_blocks.keys():
-                if unit == block:
-                    self.mass += (self.building_blocks[block]['mass']
-                                  *int(units[index+1]))
-                    self.number_carbons += (self.building_blocks[block]
-                                            ['carbons']*int(units[index+1]))
-                    self.number_hydrogens += (self.building_blocks[block]
-                                              ['hydrogens']*int(units[index+1]))
-                    self.number_nitrogens += (self.building_blocks[block]
-                                              ['nitrogens']*int(units[index+1]))
-                    self.number_oxygens += (self.building_blocks[block]
-                                            ['oxygens']*int(units[index+1]))
-                    self.number_sulfurs += (self.building_blocks[block]
-                                            ['sulfurs']*int(units[index+1]))
-                    self.total_number_units += int(units[index+1])
-                    if unit == 'S':
-                        self.number_sialic_acids += int(units[index+1])
+        composition = (self.master.isotope_cache.registry.
+                       get_composition(self.name))
+        self.mass += composition['mass']
+        self.number_carbons += composition['carbons']
+        self.number_hydrogens += composition['hydrogens']
+        self.number_nitrogens += composition['nitrogens']
+        self.number_oxygens += composition['oxygens']
+        self.number_sulfurs += composition['sulfurs']
+        self.total_number_units += composition['units']
+        self.number_sialic_acids += composition['sialic_acids']
 
     def determine_background(self):
-        background_point = sys.maxsize
-        x_data, y_data = zip(*self.data_subset)
+        self.master.determine_background([self])
 
+    def get_center_mass(self):
+        """Return the exact mass of the most abundant isotope.
+        """
         max_fraction = max(isotope.fraction for isotope in self.isotopes)
         for isotope in self.isotopes:
             if isotope.fraction == max_fraction:
                 center_mass = isotope.exact_mass
-
-        for windows in range(-self.settings.background_window,
-                             self.settings.background_window,
-                             self.settings.background_chunks):
-
-            values = []
-            averages = []
-
-            if (len(range(windows, windows+self.settings.background_chunks)) !=
-                self.settings.background_chunks):
-                break
-
-            for j in range(windows, windows+self.settings.background_chunks):
-                curr_mass = center_mass + j * elemental_abundances.carbon[0][2]
-                left_edge = bisect_left(x_data, curr_mass-self.settings.mass_window)
-                right_edge = bisect_right(x_data, curr_mass+self.settings.mass_window)
-                values.extend(y_data[left_edge:right_edge])
-                averages.append(np.average(y_data[left_edge:right_edge]))
-
-            if np.average(values) < background_point:
-                self.background_intensity = np.average(values)
-                self.background_area = np.average(averages)
-                self.noise = np.std(values)
+        return center_mass
 
     def attach_mass_modifiers(self):
-        total_modifiers = list(self.settings.mass_modifiers)
-        for _ in range(self.charge):
-            total_modifiers.append(self.settings.charge_carrier)
-
         # Modifiers that are independent of other modifiers
-        for modifier in total_modifiers:
+        for modifier in self.settings.mass_modifiers:
             if str(modifier) != "Per":
                 self.mass += self.building_blocks[modifier]['mass']
                 self.number_carbons += (self.building_blocks[modifier]
@@ -131,10 +111,10 @@ class Analyte(object):
 
         # Modifiers that can affect other modifiers
         # TODO: Test the permethylation after succesful refactoring!!
-        for modifier in total_modifiers:
+        for modifier in self.settings.mass_modifiers:
             if str(modifier) == "Per":
                 number_sites = (
-                    self.number_oxygens - (self.total_number_of_units * 2 - 2)
+                    self.number_oxygens - (self.total_number_units * 2 - 2)
                     - 1 - (1 * self.number_sialic_acids)
                 )
                 self.number_carbons += (self.building_blocks[modifier]
@@ -144,48 +124,70 @@ class Analyte(object):
                 self.mass += (self.building_blocks[modifier]['mass'] *
                               number_sites)
 
-    def calculate_analyte_isotopic_pattern(self):
-        self.calculate_elemental_distributions()
-        self.combine_distributions()
-        self.merge_isotopic_pattern()
-        self.sort_isotopic_pattern()
-        self.attach_isotopes()
-
-    def calculate_elemental_distributions(self):
-        carbons = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.carbon, self.number_carbons)
-        hydrogens = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.hydrogen, self.number_hydrogens)
-        nitrogens = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.nitrogen, self.number_nitrogens)
-        oxygens17 = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.oxygen17, self.number_oxygens)
-        oxygens18 = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.oxygen18, self.number_oxygens)
-        sulfurs33 = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.sulfur33, self.number_sulfurs)
-        sulfurs34 = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.sulfur34, self.number_sulfurs)
-        sulfurs36 = functions.calculate_elemental_isotopic_pattern(
-                  elemental_abundances.sulfur36, self.number_sulfurs)
-        self.distributions = {'carbons': carbons, 'hydrogens': hydrogens,
-                              'nitrogens': nitrogens, 'oxygens17': oxygens17,
-                              'oxygens18': oxygens18, 'sulfurs33':sulfurs33,
-                              'sulfurs34': sulfurs34, 'sulfurs36': sulfurs36}
+    def get_charge_carrier_counts(self):
+        """Return the element counts of the charge carriers at the charge.
+        """
+        charge_carrier = self.building_blocks[self.settings.charge_carrier]
+        return [charge_carrier[element] * self.charge for element in
+                ('carbons', 'hydrogens', 'nitrogens', 'oxygens', 'sulfurs')]
+
+    def attach_charge_carriers(self, neutral_distribution):
+        """Add the charge carriers and convert the distribution to m/z.
+        """
+        mass, counts, distribution = neutral_distribution
+        charge_carrier = self.building_blocks[self.settings.charge_carrier]
+        # One carrier at a time, as the carriers used to be added
+        self.mass = mass
+        for _ in range(self.charge):
+            self.mass += charge_carrier['mass']
+        carrier_counts = self.get_charge_carrier_counts()
+        if distribution is None or any(carrier_counts):
+            self.calculate_elemental_distributions(
+                    *[count + carrier_count for count, carrier_count in
+                      zip(counts, carrier_counts)])
+            distribution = self.combine_distributions()
+        masses, fractions = distribution
+        self.distributions = ((self.mass + masses) / self.charge, fractions)
+
+    def calculate_elemental_distributions(self, carbons, hydrogens,
+                                          nitrogens, oxygens, sulfurs):
+        elements = {
+            'carbons': (elemental_abundances.carbon, carbons),
+            'hydrogens': (elemental_abundances.hydrogen, hydrogens),
+            'nitrogens': (elemental_abundances.nitrogen, nitrogens),
+            'oxygens17': (elemental_abundances.oxygen17, oxygens),
+            'oxygens18': (elemental_abundances.oxygen18, oxygens),
+            'sulfurs33': (elemental_abundances.sulfur33, sulfurs),
+            'sulfurs34': (elemental_abundances.sulfur34, sulfurs),
+            'sulfurs36': (elemental_abundances.sulfur36, sulfurs)}
+        self.distributions = {}
+        for element, (isotopes, number) in elements.items():
+            self.distributions[element] = (
+                functions.calculate_elemental_isotopic_pattern(
+                    isotopes, number, self.settings.min_contribution))
 
     def combine_distributions(self):
-        totals = []
-        for x in itertools.product(
-            self.distributions['carbons'], self.distributions['hydrogens'],
-            self.distributions['nitrogens'], self.distributions['oxygens17'],
-            self.distributions['oxygens18'], self.distributions['sulfurs33'],
-            self.distributions['sulfurs34'], self.distributions['sulfurs36']
-        ):
-            i, j, k, l, m, n, o, p = x
-            totals.append((
-                (self.mass+i[0]+j[0]+k[0]+l[0]+m[0]+n[0]+o[0]+p[0]) /
-                 self.charge, i[1]*j[1]*k[1]*l[1]*m[1]*n[1]*o[1]*p[1]))
-        self.distributions = totals
+        """Convolve the elemental distributions, pruning after each element.
+        """
+        elements = ('carbons', 'hydrogens', 'nitrogens', 'oxygens17',
+                    'oxygens18', 'sulfurs33', 'sulfurs34', 'sulfurs36')
+        # Every step may drop an equal share of min_contribution, so that
+        # at most min_contribution is dropped in total
+        budget = self.settings.min_contribution / len(elements)
+        masses = np.zeros(1)
+        fractions = np.ones(1)
+        for element in elements:
+            element_masses, element_fractions = self.distributions[element]
+            masses = np.add.outer(masses, element_masses).ravel()
+            fractions = np.multiply.outer(fractions,
+                                          element_fractions).ravel()
+            # Drop the smallest combinations up to a combined fraction of
+            # the budget
+            order = np.argsort(fractions)
+            keep = np.sort(order[np.cumsum(fractions[order]) > budget])
+            masses = masses[keep]
+            fractions = fractions[keep]
+        return masses, fractions
 
     def attach_isotopes(self):
         for isotope in self.isotopic_pattern:
@@ -195,20 +197,18 @@ class Analyte(object):
             self.isotopes.append(isotope_buffer)
 
     def merge_isotopic_pattern(self):
-        results = []
-        newdata = {d: True for d in self.distributions}
-        for k, v in self.distributions:
-            if not newdata[(k, v)]: continue
-            newdata[(k, v)] = False
-            # use each piece of data only once
-            keys, values = [k*v], [v]
-            for kk, vv in [d for d in self.distributions if newdata[d]]:
-                if abs(k-kk) < self.settings.epsilon:
-                    keys.append(kk*vv)
-                    values.append(vv)
-                    newdata[(kk, vv)] = False
-            results.append((sum(keys)/sum(values), sum(values)))
-        self.isotopic_pattern = results
+        """Merge the peaks that are less than epsilon apart.
+        """
+        masses, fractions = self.distributions
+        order = np.argsort(masses, kind='stable')
+        masses = masses[order]
+        fractions = fractions[order]
+        starts = np.concatenate((
+            [0], np.flatnonzero(np.diff(masses) >= self.settings.epsilon)+1))
+        totals = np.add.reduceat(fractions, starts)
+        weighted_masses = np.add.reduceat(masses*fractions, starts)
+        self.isotopic_pattern = list(zip((weighted_masses/totals).tolist(),
+                                         totals.tolist()))
 
     def sort_isotopic_pattern(self):
         intermediate_results = sorted(self.isotopic_pattern, key=itemgetter(1),
@@ -0,0 +1,64 @@
+import itertools
+import numpy as np
+
+# Columns of the element matrix, units counts every building block and
+# sialic_acids only the sialic acid (S) block.
+COMPOSITION_FIELDS = ['mass', 'carbons', 'hydrogens', 'nitrogens', 'oxygens',
+                      'sulfurs', 'units', 'sialic_acids']
+
+
+class BuildingBlockRegistry(object):
+    """Building blocks compiled into an element matrix.
+    """
+    def __init__(self, building_blocks):
+        self.blocks = sorted(building_blocks)
+        self.block_index = {block: index for index, block in
+                            enumerate(self.blocks)}
+        element_matrix = np.zeros((len(self.blocks),
+                                   len(COMPOSITION_FIELDS)))
+        for index, block in enumerate(self.blocks):
+            for field_index, field in enumerate(COMPOSITION_FIELDS[:6]):
+                element_matrix[index, field_index] = (
+                        building_blocks[block][field])
+            element_matrix[index, 6] = 1
+            element_matrix[index, 7] = block == 'S'
+        self.element_matrix = element_matrix
+        self.compositions = {}
+
+    def parse_composition(self, name):
+        """Return the number of each building block in name.
+        """
+        units = np.zeros(len(self.blocks), dtype=np.int64)
+        tokens = ["".join(x) for _, x in itertools.groupby(name,
+                                                           key=str.isalpha)]
+        for index, token in enumerate(tokens):
+            if token in self.block_index:
+                units[self.block_index[token]] += int(tokens[index+1])
+        return units
+
+    def parse_compositions(self, names):
+        units_matrix = np.zeros((len(names), len(self.blocks)),
+                                dtype=np.int64)
+        for index, name in enumerate(names):
+            units_matrix[index] = self.parse_composition(name)
+        return units_matrix
+
+    def add_compositions(self, names):
+        """Calculate the compositions of all new names in one product.
+        """
+        names = [name for name in dict.fromkeys(names) if name not in
+                 self.compositions]
+        if not names:
+            return
+        compositions = self.parse_compositions(names) @ self.element_matrix
+        for name, composition in zip(names, compositions):
+            self.compositions[name] = composition
+
+    def get_composition(self, name):
+        """Return the mass, element and unit counts of name as a dict.
+        """
+        if name not in self.compositions:
+            self.add_compositions([name])
+        composition = self.compositions[name]
+        return {field: (float(value) if field == 'mass' else int(value))
+                for field, value in zip(COMPOSITION_FIELDS, composition)}
@@ -1,8 +1,5 @@
 import logging
 import numpy as np
-from bisect import bisect_left, bisect_right
-from scipy.interpolate import InterpolatedUnivariateSpline
-from sys import maxsize
 
 
 class Isotope(object):
@@ -12,7 +9,8 @@ class Isotope(object):
         self.settings = master.settings
         self.process_parameters = master.process_parameters
         self.charge = master.charge
-        self.data_subset = None
+        self.left_index = None
+        self.right_index = None
         self.fraction = None
         self.exact_mass = None
         self.accurate_mass = None
@@ -20,37 +18,70 @@ class Isotope(object):
         self.maximum_intensity = None
         self.total_intensity = None
 
-    def inherit_data_subset(self):
+    def get_mass_window(self):
         if self.process_parameters.calibration == True:
             mass_window = self.settings.calibration_window
         if self.process_parameters.quantitation == True:
             mass_window = self.settings.mass_window / self.charge
+        return mass_window
 
-        x_data, y_data = zip(*self.master.data_subset)
-        left_border = bisect_left(x_data, self.exact_mass-mass_window)
-        right_border = bisect_right(x_data, self.exact_mass+mass_window)
-        x_subset = x_data[left_border:right_border]
-        y_subset = y_data[left_border:right_border]
-        self.data_subset = list(zip(x_subset, y_subset))
+    @property
+    def x_data(self):
+        return self.master.master.x_data[self.left_index:self.right_index]
+
+    @property
+    def y_data(self):
+        return self.master.master.y_data[self.left_index:self.right_index]
 
     def get_accurate_mass(self):
-        x_subset, y_subset = zip(*self.data_subset)
-        x_interpolation = np.linspace(x_subset[0], x_subset[-1],
-                                      int(2500*(x_subset[-1]-x_subset[0])))
-        f = InterpolatedUnivariateSpline(x_subset, y_subset)
+        if self.settings.accurate_mass_method == 'derivative':
+            self.accurate_mass = self.get_derivative_apex()
+        elif self.settings.accurate_mass_method == 'parabolic':
+            self.accurate_mass = self.get_parabolic_apex()
+        else:
+            self.accurate_mass = self.get_spline_apex()
+
+    def get_spline_apex(self):
+        from scipy.interpolate import InterpolatedUnivariateSpline
+        x_interpolation = np.linspace(
+                self.x_data[0], self.x_data[-1],
+                int(2500*(self.x_data[-1]-self.x_data[0])))
+        f = InterpolatedUnivariateSpline(self.x_data, self.y_data)
         y_interpolation = f(x_interpolation)
-        max_value = max(y_interpolation)
-        max_index = np.where(y_interpolation == max_value)
-        self.accurate_mass = float(x_interpolation[max_index][0])
+        max_index = np.argmax(y_interpolation)
+        return float(x_interpolation[max_index])
+
+    def get_derivative_apex(self):
+        """Return the maximum of the interpolating cubic spline.
+        """
+        from scipy.interpolate import PPoly, splrep
+        spline = PPoly.from_spline(splrep(self.x_data, self.y_data, k=3,
+                                          s=0))
+        roots = spline.derivative().roots(extrapolate=False)
+        candidates = np.concatenate(([self.x_data[0], self.x_data[-1]],
+                                     roots[np.isfinite(roots)]))
+        return float(candidates[np.argmax(spline(candidates))])
+
+    def get_parabolic_apex(self):
+        """Return the apex of a Gaussian around the most intense data point.
+        """
+        apex = int(np.argmax(self.y_data))
+        if apex == 0 or apex == len(self.y_data)-1:
+            return float(self.x_data[apex])
+        x_data = self.x_data[apex-1:apex+2] - self.x_data[apex]
+        y_data = self.y_data[apex-1:apex+2]
+        # Fall back to a parabola through the intensities themselves
+        # when the logarithm is undefined
+        if np.all(y_data > 0):
+            y_data = np.log(y_data)
+        a, b, _ = np.polyfit(x_data, y_data, 2)
+        if a >= 0:
+            return float(self.x_data[apex])
+        return float(self.x_data[apex] - b / (2*a))
 
     def quantify_isotope(self):
-        self.maximum_intensity = -maxsize
-        self.total_intensity = 0
-        self.area = 0.
-        x_subset, _ = zip(*self.data_subset)
-        average_spacing = (x_subset[-1] - x_subset[0]) / len(x_subset)
-        for datapoint in self.data_subset:
-            self.area += datapoint[1] * average_spacing
-            self.maximum_intensity = max(self.maximum_intensity,
-                                         datapoint[1])
-            self.total_intensity += datapoint[1]
+        areas, totals, maxima = self.master.master.quantify_windows(
+                [self.left_index], [self.right_index])
+        self.area = float(areas[0])
+        self.total_intensity = float(totals[0])
+        self.maximum_intensity = float(maxima[0])
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import socket
+from MassyTools.bin.building_block_registry import BuildingBlockRegistry
+
+# Increase when the isotopic pattern calculation changes, this
+# invalidates all patterns stored in existing libraries.
+LIBRARY_VERSION = 6
+
+
+class IsotopePatternCache(object):
+    """Isotopic patterns shared by all mass spectra of a batch.
+    """
+    def __init__(self, building_blocks, library_file=None):
+        self.logger = logging.getLogger(__name__)
+        self.building_blocks = building_blocks
+        self.registry = BuildingBlockRegistry(building_blocks)
+        self.library_file = library_file
+        self.patterns = {}
+        self.neutral_distributions = {}
+        self.library = {}
+        self.library_changed = False
+        self.settings_hashes = {}
+
+        if self.library_file:
+            self.load_library()
+
+    def get_key(self, analyte):
+        settings = analyte.settings
+        return (analyte.name, analyte.charge,
+                tuple(settings.mass_modifiers), settings.charge_carrier,
+                settings.epsilon, settings.min_contribution,
+                settings.min_total_contribution)
+
+    def get_library_key(self, key):
+        name, charge, mass_modifiers, charge_carrier = key[:4]
+        return '|'.join([str(name), str(charge), ','.join(mass_modifiers),
+                         str(charge_carrier)])
+
+    def get_settings_hash(self, key):
+        """Return a hash of the pattern settings and building blocks.
+        """
+        pattern_settings = key[4:]
+        settings_hash = self.settings_hashes.get(pattern_settings)
+        if settings_hash is None:
+            blocks = {}
+            for block, values in self.building_blocks.items():
+                blocks[block] = [values.get(field) for field in (
+                    'mass', 'carbons', 'hydrogens', 'nitrogens', 'oxygens',
+                    'sulfurs')]
+            description = json.dumps({'version': LIBRARY_VERSION,
+                                      'settings': pattern_settings,
+                                      'blocks': blocks}, sort_keys=True)
+            settings_hash = hashlib.sha1(
+                    description.encode('utf-8')).hexdigest()
+            self.settings_hashes[pattern_settings] = settings_hash
+        return settings_hash
+
+    def get_isotopic_pattern(self, analyte):
+        key = self.get_key(analyte)
+        isotopic_pattern = self.patterns.get(key)
+        if isotopic_pattern is None:
+            library = self.library.setdefault(
+                    self.get_settings_hash(key), {})
+            library_key = self.get_library_key(key)
+            if library_key in library:
+                isotopic_pattern = tuple(
+                        (mass, fraction) for mass, fraction in
+                        library[library_key])
+            else:
+                neutral_key = (key[0], key[2], key[5])
+                neutral_distribution = self.neutral_distributions.get(
+                        neutral_key)
+                if neutral_distribution is None:
+                    neutral_distribution = (
+                            analyte.calculate_neutral_distribution())
+                    self.neutral_distributions[neutral_key] = (
+                            neutral_distribution)
+                analyte.calculate_isotopic_pattern(neutral_distribution)
+                isotopic_pattern = tuple(
+                        (float(mass), float(fraction)) for mass, fraction
+                        in analyte.isotopic_pattern)
+                library[library_key] = [list(peak) for peak in
+                                        isotopic_pattern]
+                self.library_changed = True
+            self.patterns[key] = isotopic_pattern
+        return list(isotopic_pattern)
+
+    def load_library(self):
+        try:
+            with Path(self.library_file).open() as fr:
+                self.library = json.load(fr)
+        except FileNotFoundError:
+            self.library = {}
+        except (OSError, ValueError) as e:
+            self.logger.warning('Unable to read isotope library: '+str(e))
+            self.library = {}
+
+    def save_library(self):
+        """Merge the newly calculated patterns into the library file.
+        """
+        if not self.library_file or not self.library_changed:
+            return
+        try:
+            library = {}
+            if Path(self.library_file).is_file():
+                with Path(self.library_file).open() as fr:
+                    library = json.load(fr)
+            for settings_hash, patterns in self.library.items():
+                if patterns:
+                    library.setdefault(settings_hash, {}).update(patterns)
+            # The host name keeps the temporary files of sessions on
+            # machines that share the library apart, the process id
+            # those of sessions on the same machine
+            temp_file = Path(str(self.library_file)+'.'+
+                             socket.gethostname()+'.'+str(os.getpid())+
+                             '.tmp')
+            with temp_file.open('w') as fw:
+                json.dump(library, fw)
+            os.replace(temp_file, self.library_file)
+            self.library = library
+            self.library_changed = False
+        except (OSError, ValueError) as e:
+            self.logger.warning('Unable to save isotope library: '+str(e))
@@ -2,7 +2,10 @@ from pathlib import Path, PurePath
 import logging
 import numpy as np
 
+import MassyTools.util.baseline as baseline
 import MassyTools.util.file_parser as file_parser
+import MassyTools.util.spectrum_cache as spectrum_cache
+import MassyTools.bin.elemental_abundances as elemental_abundances
 from MassyTools.bin.analyte import Analyte
 from MassyTools.bin.pdf import Pdf
 
@@ -13,34 +16,32 @@ class MassSpectrum(object):
         self.settings = master.settings
         self.process_parameters = master.process_parameters
         self.building_blocks = master.building_blocks
+        self.isotope_cache = master.isotope_cache
         self.logger = logging.getLogger(__name__)
         self.axes = master.axes
         self.filename = master.filename
         self.analytes = []
-        self.data = None
+        self.x_data = None
+        self.y_data = None
+        self.file_hash = None
+        self.indexed_y_data = None
+        self.cumulative_intensity = None
+        self.maximum_tables = None
+        self.background_profile = None
+        self.profiled_data = None
 
     def baseline_correct(self):
-        _, y_values = zip(*self.data)
-        y_average = np.average(y_values)
-        y_std = np.std(y_values)
-
-        subset = [(x, y) for (x, y) in self.data if y >= y_average-y_std and
-                  y <= y_average+y_std]
-        x_subset, y_subset = zip(*subset)
-
-        p = np.polynomial.polynomial.polyfit(x_subset, y_subset, 3)
-        f = np.polynomial.polynomial.Polynomial(p)
-
-        self.data = [(x, y-f(x)) for x, y in self.data]
+        self.y_data = baseline.correct_baseline(
+                self.x_data, self.y_data, self.settings.baseline_method,
+                self.settings.baseline_window)
 
     def calibrate(self):
         accurate_masses = []
         exact_masses = []
+        self.determine_background()
         for analyte in self.analytes:
-            analyte.determine_background()
             for isotope in analyte.isotopes:
                 if isotope.accurate_mass and isotope.charge == analyte.charge:
-                    isotope.inherit_data_subset()
                     isotope.quantify_isotope()
                     sn = ((isotope.maximum_intensity - analyte.background_intensity) /
                         analyte.noise)
@@ -53,12 +54,11 @@ class MassSpectrum(object):
                                 ' and an m/z of ' +
                                 str(isotope.exact_mass) + ' had a S/N' +
                                 ' of '+str(sn) + ' and was ignored')
-        x_values, y_values = zip(*self.data)
+        self.release_maximum_tables()
         if len(accurate_masses) < self.settings.num_total:
             self.filename = (PurePath(self.filename).parent /
                              PurePath('uncalibrated_'+str(PurePath(
                              self.filename).name)))
-            calibrated_x_values = x_values
             self.logger.warning(str(self.filename)+' not calibrated')
         else:
             self.filename = (PurePath(self.filename).parent /
@@ -66,8 +66,79 @@ class MassSpectrum(object):
                              self.filename).name)))
             calibration_parameters = np.polyfit(accurate_masses, exact_masses, 2)
             calibration_function = np.poly1d(calibration_parameters)
-            calibrated_x_values = calibration_function(x_values)
-        self.data = list(zip(calibrated_x_values, y_values))
+            self.x_data = calibration_function(self.x_data)
+
+    def determine_background(self, analytes=None):
+        """Determine the background and noise of analytes, by default all.
+        """
+        if analytes is None:
+            analytes = self.analytes
+        if not analytes:
+            return
+        if self.settings.background_method == 'profile':
+            self.determine_profile_background(analytes)
+            return
+        window = self.settings.background_window
+        chunks = self.settings.background_chunks
+        offsets = ((np.arange(-window, window, chunks)[:, None] +
+                    np.arange(chunks)) * elemental_abundances.carbon[0][2])
+        centers = np.array([analyte.get_center_mass() for analyte in
+                            analytes])
+        masses = centers[:, None, None] + offsets
+
+        # Windows are limited to the data subset of their analyte
+        lower = np.array([analyte.left_index for analyte in
+                          analytes])[:, None, None]
+        upper = np.array([analyte.right_index for analyte in
+                          analytes])[:, None, None]
+        left = np.clip(np.searchsorted(
+                self.x_data, masses-self.settings.mass_window, side='left'),
+                lower, upper)
+        right = np.clip(np.searchsorted(
+                self.x_data, masses+self.settings.mass_window, side='right'),
+                lower, upper)
+
+        cumulative_intensity = self.get_intensity_index()
+        counts = right - left
+        totals = cumulative_intensity[right] - cumulative_intensity[left]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            areas = np.mean(totals / counts, axis=2)
+            averages = totals.sum(axis=2) / counts.sum(axis=2)
+
+        # Chunks without data points have a NaN average and are skipped
+        # TODO: The original loop was meant to select the chunk with the
+        # lowest average, this result change is tracked separately
+        valid = ~np.isnan(averages)
+        best_chunks = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+        for index, analyte in enumerate(analytes):
+            best_chunk = best_chunks[index]
+            if not valid[index, best_chunk]:
+                continue
+            analyte.background_intensity = float(averages[index, best_chunk])
+            analyte.background_area = float(areas[index, best_chunk])
+
+            # The noise is only needed for the selected chunk, its
+            # spread is taken around the chunk mean to keep precision
+            values = np.concatenate([self.y_data[start:end] for start, end
+                                     in zip(left[index, best_chunk],
+                                            right[index, best_chunk])])
+            analyte.noise = float(np.std(values))
+
+    def determine_profile_background(self, analytes):
+        """Determine the background and noise of analytes from the profile.
+        """
+        centers, backgrounds, noises = self.get_background_profile()
+        if not len(centers):
+            return
+        masses = [analyte.get_center_mass() for analyte in analytes]
+        background_intensities = np.interp(masses, centers, backgrounds)
+        analyte_noises = np.interp(masses, centers, noises)
+        for analyte, background_intensity, noise in zip(
+                analytes, background_intensities.tolist(),
+                analyte_noises.tolist()):
+            analyte.background_intensity = background_intensity
+            analyte.background_area = background_intensity
+            analyte.noise = noise
 
     def generate_pdf_report(self):
         pdf = Pdf(self)
@@ -76,32 +147,132 @@ class MassSpectrum(object):
             pdf.plot_mass_spectrum_peak()
         pdf.close_pdf()
 
+    def get_background_profile(self):
+        """Return the m/z, background and noise of segments of the spectrum.
+        """
+        if (self.profiled_data is None or
+                self.profiled_data[0] is not self.x_data or
+                self.profiled_data[1] is not self.y_data):
+            starts = np.arange(self.x_data[0], self.x_data[-1],
+                               self.settings.background_window)
+            borders = np.append(np.searchsorted(self.x_data, starts),
+                                len(self.x_data))
+            centers = []
+            backgrounds = []
+            noises = []
+            for left, right in zip(borders[:-1], borders[1:]):
+                if right == left:
+                    continue
+                y_data = self.y_data[left:right]
+                median = np.median(y_data)
+                centers.append(np.mean(self.x_data[left:right]))
+                backgrounds.append(np.percentile(
+                        y_data, self.settings.background_percentile))
+                noises.append(1.4826 * np.median(np.abs(y_data - median)))
+            self.background_profile = (np.array(centers),
+                                       np.array(backgrounds),
+                                       np.array(noises))
+            self.profiled_data = (self.x_data, self.y_data)
+        return self.background_profile
+
+    def get_intensity_index(self):
+        """Return the cumulative intensity, with a leading zero.
+        """
+        if self.indexed_y_data is not self.y_data:
+            self.cumulative_intensity = np.concatenate((
+                [0.], np.cumsum(self.y_data, dtype=np.float64)))
+            self.maximum_tables = None
+            self.indexed_y_data = self.y_data
+        return self.cumulative_intensity
+
+    def get_maximum_table(self, level):
+        """Return the sparse table of maxima of runs of 2**level points.
+        """
+        self.get_intensity_index()
+        if self.maximum_tables is None:
+            self.maximum_tables = [self.y_data]
+        while len(self.maximum_tables) <= level:
+            previous = self.maximum_tables[-1]
+            step = 1 << (len(self.maximum_tables)-1)
+            self.maximum_tables.append(np.maximum(previous[:-step],
+                                                  previous[step:]))
+        return self.maximum_tables[level]
+
+    def get_total_intensity(self):
+        return float(self.get_intensity_index()[-1])
+
+    def inherit_data_subsets(self):
+        """Set the windows of all analytes and their isotopes.
+        """
+        if not self.analytes:
+            return
+        isotopes = [isotope for analyte in self.analytes for isotope in
+                    analyte.isotopes]
+        analyte_window = (self.settings.background_window +
+                          self.settings.mass_window)
+        centers = np.array([analyte.get_center_mass() for analyte in
+                            self.analytes] +
+                           [isotope.exact_mass for isotope in isotopes])
+        mass_windows = np.array([analyte_window] * len(self.analytes) +
+                                [isotope.get_mass_window() for isotope in
+                                 isotopes])
+        left_borders = np.searchsorted(self.x_data, centers-mass_windows,
+                                       side='left')
+        right_borders = np.searchsorted(self.x_data, centers+mass_windows,
+                                        side='right')
+
+        number_analytes = len(self.analytes)
+        analyte_left = left_borders[:number_analytes]
+        analyte_right = right_borders[:number_analytes]
+        number_isotopes = [len(analyte.isotopes) for analyte in self.analytes]
+        lower = np.repeat(analyte_left, number_isotopes)
+        upper = np.repeat(analyte_right, number_isotopes)
+        isotope_left = np.clip(left_borders[number_analytes:], lower, upper)
+        isotope_right = np.clip(right_borders[number_analytes:], lower,
+                                upper)
+
+        for analyte, left, right in zip(self.analytes, analyte_left.tolist(),
+                                        analyte_right.tolist()):
+            analyte.left_index = left
+            analyte.right_index = right
+        for isotope, left, right in zip(isotopes, isotope_left.tolist(),
+                                        isotope_right.tolist()):
+            isotope.left_index = left
+            isotope.right_index = right
+
     def normalize_mass_spectrum(self):
-        x_array, y_array = zip(*self.data)
-        maximum = max(y_array)
-        normalized_y_array = [x/maximum for x in y_array]
-        self.data = list(zip(x_array, normalized_y_array))
+        maximum = np.max(self.y_data)
+        self.y_data = self.y_data / maximum
 
     def open_mass_spectrum(self):
-        file_type = None
-        with Path(self.filename).open() as fr:
-            for line in fr:
-                # Prototype (File Recognition)
-                if 'utter_nonsense' in line:
-                    file_type = 'Bruker'
-
-        if file_type == None:
-            try:
-                file_parser.open_xy_spectrum(self)
-            except Exception as e:
-                self.logger.error(e)
+        if self.settings.spectrum_cache:
+            cached_data = spectrum_cache.load_cached_spectrum(self.filename)
+            if cached_data is not None:
+                self.x_data, self.y_data = cached_data
+                return
+
+        try:
+            file_format = file_parser.get_reader(self.filename)
+            if file_format is None:
+                self.logger.error(str(self.filename)+' is not a recognized '+
+                                  'mass spectrum format')
+            else:
+                _, reader = file_format
+                reader(self)
+        except Exception as e:
+            self.logger.error(str(self.filename)+': '+str(e))
+
+        if self.settings.spectrum_cache and self.x_data is not None:
+            spectrum_cache.save_cached_spectrum(self.filename, self.x_data,
+                                                self.y_data, self.file_hash)
 
     def plot_mass_spectrum(self):
         label = PurePath(self.filename).stem
-        x_array, y_array = zip(*self.data)
-        self.axes.plot(x_array, y_array, label=str(label))
+        self.axes.plot(self.x_data, self.y_data, label=str(label))
 
     def process_mass_spectrum(self):
+        self.isotope_cache.registry.add_compositions(
+                [peak['name'] for peak in self.master.peak_list])
         analytes = []
         for peak in self.master.peak_list:
             for charge in range(
@@ -117,8 +288,8 @@ class MassSpectrum(object):
                 high_border = (
                         analyte_buffer.isotopes[-1].exact_mass +
                         self.settings.background_window)
-                if (low_border > self.data[0][0] and high_border <
-                            self.data[-1][0]):
+                if (low_border > self.x_data[0] and high_border <
+                            self.x_data[-1]):
                     analytes.append(analyte_buffer)
                 else:
                     self.logger.warning(
@@ -128,36 +299,77 @@ class MassSpectrum(object):
                             'outside of the mass spectrum '+
                             'range.')
         self.analytes = analytes
+        self.inherit_data_subsets()
 
         for analyte in self.analytes:
-            analyte.inherit_data_subset()
             max_fraction = max(isotope.fraction for isotope in
                                analyte.isotopes)
             for isotope in analyte.isotopes:
-                isotope.inherit_data_subset()
                 if (isotope.fraction == max_fraction and
                             isotope.charge == analyte.charge):
                     isotope.get_accurate_mass()
 
     def quantify_mass_spectrum(self):
+        isotopes = []
+        self.determine_background()
         for analyte in self.analytes:
-            analyte.determine_background()
             max_fraction = max(isotope.fraction for isotope in
                                analyte.isotopes)
             for isotope in analyte.isotopes:
                 if (isotope.fraction == max_fraction and
                             isotope.charge == analyte.charge):
                     isotope.get_accurate_mass()
-                isotope.quantify_isotope()
+                isotopes.append(isotope)
+
+        areas, totals, maxima = self.quantify_windows(
+                [isotope.left_index for isotope in isotopes],
+                [isotope.right_index for isotope in isotopes])
+        for isotope, area, total, maximum in zip(
+                isotopes, areas.tolist(), totals.tolist(), maxima.tolist()):
+            isotope.area = area
+            isotope.total_intensity = total
+            isotope.maximum_intensity = maximum
+        self.release_maximum_tables()
+
+    def quantify_windows(self, left_indices, right_indices):
+        """Return the area, total and maximum intensity of each window.
+        """
+        left_indices = np.asarray(left_indices, dtype=np.intp)
+        right_indices = np.asarray(right_indices, dtype=np.intp)
+        cumulative_intensity = self.get_intensity_index()
+        lengths = right_indices - left_indices
+        filled = lengths > 0
+
+        totals = (cumulative_intensity[right_indices] -
+                  cumulative_intensity[left_indices])
+        areas = np.zeros(len(lengths))
+        maxima = np.full(len(lengths), np.nan)
+
+        left = left_indices[filled]
+        right = right_indices[filled]
+        average_spacing = ((self.x_data[right-1] - self.x_data[left]) /
+                           lengths[filled])
+        areas[filled] = totals[filled] * average_spacing
+
+        levels = np.floor(np.log2(lengths[filled])).astype(np.intp)
+        filled_maxima = np.empty(len(levels))
+        for level in np.unique(levels):
+            table = self.get_maximum_table(level)
+            selection = levels == level
+            filled_maxima[selection] = np.maximum(
+                    table[left[selection]],
+                    table[right[selection] - (1 << level)])
+        maxima[filled] = filled_maxima
+        return areas, totals, maxima
+
+    def release_maximum_tables(self):
+        self.maximum_tables = None
 
     def save_mass_spectrum(self):
         with Path(self.filename).open('w') as fw:
-            for data_point in self.data:
-                fw.write(
-                    str(format(data_point[0], '0.' +
-                        str(self.settings.decimal_numbers)+'f'))+'\t' +
-                    str(format(data_point[1], '0.' +
-                        str(self.settings.decimal_numbers)+'f'))+'\n')
+            np.savetxt(fw, np.column_stack((self.x_data, self.y_data)),
+                       fmt='%0.'+str(self.settings.decimal_numbers)+'f',
+                       delimiter='\t')
 
 def finalize_plot(master):
     master.axes.set_xlabel('m/z [Th]')
@@ -1,8 +1,28 @@
+import io
+import json
 import logging
+import os
 from datetime import datetime
 from pathlib import Path
 import MassyTools.gui.version as version
 
+# Increase when the layout of partial summary files changes
+PARTIAL_VERSION = 1
+
+
+def get_partial_filename(shard):
+    return 'MassyTools_shard_'+str(shard[0])+'_of_'+str(shard[1])+'.json'
+
+def write_sections(fw, sections):
+    """Write (title, header, rows) sections in the summary file layout.
+    """
+    for title, header, rows in sections:
+        fw.write(title)
+        fw.write(header)
+        for row in rows:
+            fw.write(row+'\n')
+        fw.write('\n')
+
 
 class Output(object):
     def __init__(self, master):
@@ -14,54 +34,160 @@ class Output(object):
         utc_datetime = datetime.utcnow()
         s = utc_datetime.strftime('%Y-%m-%d %H%M')
         self.filename = s + '_summary.txt'
+        self.header = None
+        self.sections = None
+        self.row_files = []
+
+    def add_mass_spectrum(self, mass_spectrum, filename=None):
+        """Append the summary rows of a quantified mass spectrum.
+        """
+        if self.header is None:
+            self.build_header(mass_spectrum)
+        self.add_result(self.get_result(mass_spectrum, header=False),
+                        filename)
+
+    def add_result(self, result, filename=None):
+        """Append a result from get_result, with the file it was read from.
+        """
+        header, rows = result
+        if self.header is None:
+            self.header = header
+        if self.sections is None:
+            self.sections = [(title, formatter, [])
+                             for title, formatter in self.get_sections()]
+        for (_, _, section_rows), row in zip(self.sections, rows):
+            section_rows.append(row)
+        self.row_files.append(None if filename is None else
+                              Path(filename).name)
 
-    def build_header(self):
+    def get_result(self, mass_spectrum, header=True):
+        """Return the header and the rows of a quantified mass spectrum.
+        """
+        name = str(Path(mass_spectrum.filename).stem)
+        rows = [name + formatter(mass_spectrum)
+                for _, formatter in self.get_sections()]
+        if header:
+            return self.format_header(mass_spectrum), rows
+        return None, rows
+
+    def build_header(self, mass_spectrum=None):
+        if mass_spectrum is None and self.master.mass_spectra:
+            mass_spectrum = self.master.mass_spectra[0]
+        self.header = self.format_header(mass_spectrum)
+
+    def format_header(self, mass_spectrum):
         header = ''
-        for mass_spectrum in self.master.mass_spectra:
+        if mass_spectrum is not None:
             for analyte in mass_spectrum.analytes:
                 header = (header + '\t' + str(analyte.name) + ' [' +
                          str(analyte.charge) + 'z]')
             header = header + '\n'
-            break
 
         header = header + 'Exact m/z'
-        for mass_spectrum in self.master.mass_spectra:
+        if mass_spectrum is not None:
             for analyte in mass_spectrum.analytes:
                 for isotope in analyte.isotopes:
                     header = header + '\t' + str(isotope.exact_mass)
                     break
             header = header + '\n'
-            break
 
-        self.header = header
+        return header
 
     def build_output_file(self):
-        self.build_header()
+        """Write all sections to the summary file or partial summary file.
+        """
+        if self.sections is None:
+            for mass_spectrum in self.master.mass_spectra or []:
+                self.add_mass_spectrum(mass_spectrum)
+        if self.master.process_parameters.shard:
+            self.write_partial_file()
+            return
+        if self.sections is None:
+            return
+
+        with Path(self.master.base_dir / Path(self.filename)).open(
+                  'a') as fw:
+            write_sections(fw, [(title, self.get_section_header(formatter),
+                                 rows) for title, formatter, rows in
+                                self.sections])
+
+    def get_output_file(self):
+        """Return the path of the summary file or partial summary file.
+        """
+        shard = self.master.process_parameters.shard
+        if shard:
+            return Path(self.master.base_dir) / get_partial_filename(shard)
+        return Path(self.master.base_dir) / self.filename
 
+    def get_section_header(self, formatter):
+        if formatter == self.format_non_quantified_fraction:
+            return '\n'
+        return self.header
+
+    def write_partial_file(self):
+        """Write the preamble, headers and rows of a shard to a JSON file.
+        """
+        sections = self.sections or []
+        partial = {
+            'version': PARTIAL_VERSION,
+            'shard': list(self.master.process_parameters.shard),
+            'preamble': self.format_preamble(),
+            'sections': [{'title': title,
+                          'header': self.get_section_header(formatter)}
+                         for title, formatter, _ in sections],
+            'files': self.row_files,
+            'rows': [list(rows) for rows in
+                     zip(*(rows for _, _, rows in sections))],
+        }
+        output_file = self.get_output_file()
+        temp_file = output_file.with_name(output_file.name+'.tmp')
+        with temp_file.open('w') as fw:
+            json.dump(partial, fw)
+        os.replace(temp_file, output_file)
+
+    def get_sections(self):
+        sections = []
         if self.output_parameters.absolute_intensity.get() == True:
             if self.output_parameters.background_subtraction.get() == True:
-                self.write_back_sub_abs_peak_intensity()
+                sections.append((
+                    'Background Subtracted Intensities (Area)',
+                    self.format_back_sub_abs_peak_intensity))
             else:
-                self.write_abs_peak_intensity()
+                sections.append(('Intensities (Area)',
+                                 self.format_abs_peak_intensity))
 
         if self.output_parameters.relative_intensity.get() == True:
             if self.output_parameters.background_subtraction.get() == True:
-                self.write_back_sub_rel_peak_intensity()
+                sections.append((
+                    'Background Subtracted Relative Intensities (Area)',
+                    self.format_back_sub_rel_peak_intensity))
             else:
-                self.write_rel_peak_intensity()
+                sections.append(('Relative Intensities (Area)',
+                                 self.format_rel_peak_intensity))
 
         if self.output_parameters.analyte_quality_criteria.get() == True:
-            self.write_mass_accuracy()
-            self.write_signal_to_noise()
-            self.write_isotopic_pattern_quality()
+            sections.append(('Mass Accuracy [ppm]',
+                             self.format_mass_accuracy))
+            sections.append(('Signal-to-Noise',
+                             self.format_signal_to_noise))
+            sections.append(('Isotopic Pattern Quality',
+                             self.format_isotopic_pattern_quality))
 
         if self.output_parameters.spectral_quality_criteria.get() == True:
-            self.write_non_quantified_fraction()
+            sections.append(('Residual Intensity',
+                             self.format_non_quantified_fraction))
+        return sections
 
     def init_output_file(self):
+        # Shards write their preamble to the partial summary file
+        if self.master.process_parameters.shard:
+            return
         with Path(self.master.base_dir / Path(self.filename)).open(
                   'w') as fw:
+            fw.write(self.format_preamble())
 
+    def format_preamble(self):
+        with io.StringIO() as fw:
             fw.write('MassyTools Metadata\n')
             fw.write('Version:\t'+str(version.version)+'\n')
             fw.write('Build:\t'+str(version.build)+'\n')
@@ -101,157 +227,101 @@ class Output(object):
             fw.write('Decimal Numbers:\t'+str(
                      self.settings.decimal_numbers)+'\n')
             fw.write('\n')
+            return fw.getvalue()
 
-    def write_abs_peak_intensity(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
-
-            fw.write('Intensities (Area)')
-            fw.write(self.header)
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                for analyte in mass_spectrum.analytes:
-                    intensity = 0
-                    for isotope in analyte.isotopes:
-                        intensity += isotope.area
-                    fw.write('\t'+str(intensity))
-                fw.write('\n')
-            fw.write('\n')
-
-    def write_back_sub_abs_peak_intensity(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
-
-            fw.write('Background Subtracted Intensities (Area)')
-            fw.write(self.header)
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                for analyte in mass_spectrum.analytes:
-                    intensity = 0
-                    for isotope in analyte.isotopes:
-                        intensity += (isotope.area -
-                                      analyte.background_area)
-                    fw.write('\t'+str(intensity))
-                fw.write('\n')
-            fw.write('\n')
-
-    def write_back_sub_rel_peak_intensity(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
+    def format_abs_peak_intensity(self, mass_spectrum):
+        row = ''
+        for analyte in mass_spectrum.analytes:
+            intensity = 0
+            for isotope in analyte.isotopes:
+                intensity += isotope.area
+            row += '\t'+str(intensity)
+        return row
 
-            fw.write('Background Subtracted Relative Intensities (Area)')
-            fw.write(self.header)
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                total_intensity = 0
-                for analyte in mass_spectrum.analytes:
-                    for isotope in analyte.isotopes:
-                        total_intensity += (isotope.area -
-                                            analyte.background_area)
-                for analyte in mass_spectrum.analytes:
-                    intensity = 0
-                    for isotope in analyte.isotopes:
-                        intensity += (isotope.area -
-                                      analyte.background_area)
-                    intensity = intensity / total_intensity
-                    fw.write('\t'+str(intensity))
-                fw.write('\n')
-            fw.write('\n')
+    def format_back_sub_abs_peak_intensity(self, mass_spectrum):
+        row = ''
+        for analyte in mass_spectrum.analytes:
+            intensity = 0
+            for isotope in analyte.isotopes:
+                intensity += (isotope.area -
+                              analyte.background_area)
+            row += '\t'+str(intensity)
+        return row
 
-    def write_isotopic_pattern_quality(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
+    def format_back_sub_rel_peak_intensity(self, mass_spectrum):
+        row = ''
+        total_intensity = 0
+        for analyte in mass_spectrum.analytes:
+            for isotope in analyte.isotopes:
+                total_intensity += (isotope.area -
+                                    analyte.background_area)
+        for analyte in mass_spectrum.analytes:
+            intensity = 0
+            for isotope in analyte.isotopes:
+                intensity += (isotope.area -
+                              analyte.background_area)
+            intensity = intensity / total_intensity
+            row += '\t'+str(intensity)
+        return row
 
-            fw.write('Isotopic Pattern Quality')
-            fw.write(self.header)
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                for analyte in mass_spectrum.analytes:
-                    total_intensity = 0.
-                    for isotope in analyte.isotopes:
-                        total_intensity += (isotope.area -
-                                            analyte.background_area)
-                    ipq = 0.
-                    for isotope in analyte.isotopes:
-                        ipq += abs(isotope.fraction - ((isotope.area -
-                                   analyte.background_area) /
-                                   total_intensity))
-                    fw.write('\t'+str(ipq))
-                fw.write('\n')
-            fw.write('\n')
+    def format_isotopic_pattern_quality(self, mass_spectrum):
+        row = ''
+        for analyte in mass_spectrum.analytes:
+            total_intensity = 0.
+            for isotope in analyte.isotopes:
+                total_intensity += (isotope.area -
+                                    analyte.background_area)
+            ipq = 0.
+            for isotope in analyte.isotopes:
+                ipq += abs(isotope.fraction - ((isotope.area -
+                           analyte.background_area) /
+                           total_intensity))
+            row += '\t'+str(ipq)
+        return row
 
-    def write_mass_accuracy(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
+    def format_mass_accuracy(self, mass_spectrum):
+        row = ''
+        for analyte in mass_spectrum.analytes:
+            for isotope in analyte.isotopes:
+                if isotope.accurate_mass:
+                    # ((O-E)/E)*1^E6
+                    mass_accuracy = (
+                        ((isotope.accurate_mass -
+                        isotope.exact_mass) /
+                        isotope.exact_mass) * 1000000)
+                    row += '\t'+str(mass_accuracy)
+        return row
 
-            fw.write('Mass Accuracy [ppm]')
-            fw.write(self.header)
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                for analyte in mass_spectrum.analytes:
-                    for isotope in analyte.isotopes:
-                        if isotope.accurate_mass:
-                            # ((O-E)/E)*1^E6
-                            mass_accuracy = (
-                                ((isotope.accurate_mass -
-                                isotope.exact_mass) /
-                                isotope.exact_mass) * 1000000)
-                            fw.write('\t'+str(mass_accuracy))
-                fw.write('\n')
-            fw.write('\n')
+    def format_rel_peak_intensity(self, mass_spectrum):
+        row = ''
+        total_intensity = 0
+        for analyte in mass_spectrum.analytes:
+            for isotope in analyte.isotopes:
+                total_intensity += isotope.area
+        for analyte in mass_spectrum.analytes:
+            intensity = 0
+            for isotope in analyte.isotopes:
+                intensity += isotope.area
+            intensity = intensity / total_intensity
+            row += '\t'+str(intensity)
+        return row
 
-    def write_rel_peak_intensity(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
+    def format_signal_to_noise(self, mass_spectrum):
+        row = ''
+        for analyte in mass_spectrum.analytes:
+            for isotope in analyte.isotopes:
+                if isotope.accurate_mass:
+                    signal_to_noise = (
+                        (isotope.maximum_intensity -
+                        analyte.background_intensity) /
+                        analyte.noise)
+                    row += '\t'+str(signal_to_noise)
+        return row
 
-            fw.write('Relative Intensities (Area)')
-            fw.write(self.header)
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                total_intensity = 0
-                for analyte in mass_spectrum.analytes:
-                    for isotope in analyte.isotopes:
-                        total_intensity += isotope.area
-                for analyte in mass_spectrum.analytes:
-                    intensity = 0
-                    for isotope in analyte.isotopes:
-                        intensity += isotope.area
-                    intensity = intensity / total_intensity
-                    fw.write('\t'+str(intensity))
-                fw.write('\n')
-            fw.write('\n')
-
-    def write_signal_to_noise(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
-
-            fw.write('Signal-to-Noise')
-            fw.write(self.header)
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                for analyte in mass_spectrum.analytes:
-                    for isotope in analyte.isotopes:
-                        if isotope.accurate_mass:
-                            signal_to_noise = (
-                                (isotope.maximum_intensity -
-                                analyte.background_intensity) /
-                                analyte.noise)
-                            fw.write('\t'+str(signal_to_noise))
-                fw.write('\n')
-            fw.write('\n')
-
-    def write_non_quantified_fraction(self):
-        with Path(self.master.base_dir / Path(self.filename)).open(
-                  'a') as fw:
-
-            fw.write('Residual Intensity\n')
-            for mass_spectrum in self.master.mass_spectra:
-                fw.write(str(Path(mass_spectrum.filename).stem))
-                total_spectrum_intensity = sum([x[1] for x in mass_spectrum.data])
-                total_analyte_intensity = 0
-                for analyte in mass_spectrum.analytes:
-                    for isotope in analyte.isotopes:
-                        total_analyte_intensity += isotope.total_intensity
-                fw.write('\t'+str(total_analyte_intensity /
-                                  total_spectrum_intensity)+'\n')
-            fw.write('\n')
+    def format_non_quantified_fraction(self, mass_spectrum):
+        total_spectrum_intensity = mass_spectrum.get_total_intensity()
+        total_analyte_intensity = 0
+        for analyte in mass_spectrum.analytes:
+            for isotope in analyte.isotopes:
+                total_analyte_intensity += isotope.total_intensity
+        return '\t'+str(total_analyte_intensity / total_spectrum_intensity)
@@ -1,23 +1,60 @@
 import configparser
 import logging
-import tkinter as tk
 from pathlib import Path
 
+OUTPUT_FIELDS = ['absolute_intensity', 'relative_intensity',
+                 'background_subtraction', 'analyte_quality_criteria',
+                 'spectral_quality_criteria', 'pdf_report']
 
-class OutputParameters(object):
+
+class Value(object):
+    """Plain value with the get and set methods of a tk variable.
+    """
+    def __init__(self, value=0):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class OutputParameterValues(object):
     def __init__(self):
+        self.absolute_intensity = Value()
+        self.relative_intensity = Value()
+        self.background_subtraction = Value()
+        self.analyte_quality_criteria = Value()
+        self.spectral_quality_criteria = Value()
+        self.pdf_report = Value()
+
+
+class OutputParameters(object):
+    """Output selection, stored in tk variables or plain values.
+    """
+    def __init__(self, variable=Value, settings_file=None):
         self.config = configparser.ConfigParser()
         self.logger = logging.getLogger(__name__)
+        self.settings_file = settings_file or Path.cwd() / 'MassyTools.ini'
 
-        self.absolute_intensity = tk.IntVar()
-        self.relative_intensity = tk.IntVar()
-        self.background_subtraction = tk.IntVar()
-        self.analyte_quality_criteria = tk.IntVar()
-        self.spectral_quality_criteria = tk.IntVar()
-        self.pdf_report = tk.IntVar()
+        self.absolute_intensity = variable()
+        self.relative_intensity = variable()
+        self.background_subtraction = variable()
+        self.analyte_quality_criteria = variable()
+        self.spectral_quality_criteria = variable()
+        self.pdf_report = variable()
 
         self.read_from_disk()
 
+    def get_values(self):
+        """Return a picklable copy with plain values.
+        """
+        values = OutputParameterValues()
+        for name in OUTPUT_FIELDS:
+            getattr(values, name).set(getattr(self, name).get())
+        return values
+
     def save_to_disk(self):
         try:
             self.config.add_section('Output')
@@ -35,12 +72,12 @@ class OutputParameters(object):
                         str(self.spectral_quality_criteria.get()))
         self.config.set('Output', 'PDF Reports',
                         str(self.pdf_report.get()))
-        with Path(Path.cwd() / 'MassyTools.ini').open('w') as config_file:
+        with Path(self.settings_file).open('w') as config_file:
             self.config.write(config_file)
 
     def read_from_disk(self):
-        if Path(Path.cwd() / 'MassyTools.ini').is_file():
-            self.config.read('MassyTools.ini')
+        if Path(self.settings_file).is_file():
+            self.config.read(str(self.settings_file))
 
             try:
                 self.absolute_intensity.set(int(
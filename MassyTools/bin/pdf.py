@@ -1,12 +1,15 @@
 import MassyTools.gui.version as version
-from matplotlib.figure import Figure
+import numpy as np
 from pathlib import Path
 from datetime import datetime
-from matplotlib.backends.backend_pdf import PdfPages
 
 
 class Pdf(object):
     def __init__(self, master):
+        # matplotlib is only imported once a report is generated
+        from matplotlib.backends.backend_pdf import PdfPages
+        from matplotlib.figure import Figure
+
         self.master = master
         parent_dir = Path(master.filename).parent
         pdf_file = str(Path(master.filename).stem)+'.pdf'
@@ -31,15 +34,14 @@ class Pdf(object):
         meta_data['CreationDate'] = datetime.now()
 
     def plot_mass_spectrum(self):
-        x_data, y_data = zip(*self.master.data)
-
         self.axes.clear()
-        self.axes.plot(x_data, y_data)
+        self.axes.plot(self.master.x_data, self.master.y_data)
         self.axes.set_title(str(self.master.filename))
         self.pdf.savefig(self.fig)
 
     def plot_mass_spectrum_peak(self):
-        x_data, y_data = zip(*self.master.analyte.data_subset)
+        x_data = self.master.analyte.x_data
+        y_data = self.master.analyte.y_data
 
         max_peak = 0.
         for isotope in self.master.analyte.isotopes:
@@ -54,8 +56,7 @@ class Pdf(object):
 
         for isotope in self.master.analyte.isotopes:
             if isotope.fraction == max_peak:
-                iso_x, iso_y = zip(*isotope.data_subset)
-                main_isotope = iso_x[iso_y.index(signal)]
+                main_isotope = isotope.x_data[np.argmax(isotope.y_data)]
 
         self.axes.clear()
         self.axes.plot(x_data, y_data, color='blue')
@@ -5,3 +5,4 @@ class ProcessParameters(object):
         self.quantitation_file = None
         self.quantitation = False
         self.data_folder = None
+        self.shard = None  # (k, n) to process shard k of n
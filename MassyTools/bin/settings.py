@@ -4,9 +4,10 @@ from pathlib import Path
 
 
 class Settings(object):
-    def __init__(self):
+    def __init__(self, settings_file=None):
         self.config = configparser.ConfigParser()
         self.logger = logging.getLogger(__name__)
+        self.settings_file = settings_file or Path.cwd() / 'MassyTools.ini'
 
         # Changeable via GUI (Mostly)
         self.mass_modifiers = ['free']
@@ -27,8 +28,21 @@ class Settings(object):
         # Changeable via source
         self.min_contribution = 0.0001
         self.background_chunks = 4
+        self.background_method = 'local'  # 'local' or 'profile'
+        self.background_percentile = 50
+        self.accurate_mass_method = 'spline'  # 'spline', 'derivative' or 'parabolic'
+        self.baseline_method = 'polynomial'  # 'polynomial', 'rolling_minimum' or 'snip'
+        self.baseline_window = 500  # Data points
+        self.worker_processes = 0  # 0 uses one process per core
+        self.baseline_processes = 1
         self.epsilon = 0.1
         self.decimal_numbers = 8
+        self.spectrum_cache = True
+        self.reading_threads = 4
+        self.batch_mode = 'phased'  # 'phased', 'streaming', 'parallel' or 'pipeline'
+        self.pipeline_threads = 1  # Compute threads of the pipeline
+        self.pipeline_queue_size = 4
+        self.isotope_library = 'MassyTools_isotopes.json'
 
         self.read_from_disk()
 
@@ -66,12 +80,12 @@ class Settings(object):
         self.config.set('Quantitation', 'Mass window', str(self.mass_window))
         self.config.set('Quantitation', 'SN cutoff', str(self.sn_cutoff))
         self.config.set('Quantitation', 'Min isotopic contribution', str(self.min_total_contribution))
-        with Path(Path.cwd() / 'MassyTools.ini').open('w') as config_file:
+        with Path(self.settings_file).open('w') as config_file:
             self.config.write(config_file)
 
     def read_from_disk(self):
-        if Path(Path.cwd() / 'MassyTools.ini').is_file():
-            self.config.read('MassyTools.ini')
+        if Path(self.settings_file).is_file():
+            self.config.read(str(self.settings_file))
             try:
                 self.mass_modifiers = self.config.get(
                         'General', 'Mass modifiers')
@@ -0,0 +1,231 @@
+"""Headless batch processing of a folder of mass spectra.
+"""
+import argparse
+from datetime import datetime
+import logging
+from pathlib import Path
+import sys
+
+import MassyTools.util.functions as functions
+from MassyTools.bin.output_parameters import OUTPUT_FIELDS, OutputParameters
+from MassyTools.bin.process_parameters import ProcessParameters
+from MassyTools.bin.settings import Settings
+from MassyTools.util.batch_process import BatchProcess
+from MassyTools.util.console_progress import ConsoleProgressWindow
+from MassyTools.util.shards import merge_partial_files, parse_shard
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_ERRORS = 3
+EXIT_NO_DATA = 4
+
+BLOCK_FOLDER = Path(__file__).resolve().parent.parent / 'blocks'
+BATCH_MODES = ['phased', 'streaming', 'parallel', 'pipeline']
+EXIT_CODES = '''exit codes:
+  0  all files were processed without errors
+  1  the batch was aborted by an unexpected error
+  2  invalid command-line arguments or input files
+  3  the batch completed but errors were logged for some files
+  4  the data folder contains no mass spectra'''
+
+
+class ErrorCounter(logging.Handler):
+    """Counts the errors that are logged while the batch runs.
+    """
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class CommandLine(object):
+    """Master of a headless BatchProcess, taking the place of the GUI.
+    """
+    def __init__(self, arguments):
+        self.logger = logging.getLogger(__name__)
+        self.settings = Settings(arguments.settings)
+        self.output_parameters = OutputParameters(
+                settings_file=arguments.settings)
+        self.process_parameters = ProcessParameters()
+        self.building_blocks = functions.read_building_blocks(
+                arguments.blocks)
+        self.axes = None
+
+        self.process_parameters.data_folder = arguments.data_folder
+        self.process_parameters.calibration_file = arguments.calibration_file
+        self.process_parameters.quantitation_file = arguments.analyte_file
+        self.process_parameters.shard = arguments.shard
+
+        if arguments.output:
+            for name in OUTPUT_FIELDS:
+                getattr(self.output_parameters, name).set(
+                        int(name in arguments.output))
+        if arguments.batch_mode:
+            self.settings.batch_mode = arguments.batch_mode
+        if arguments.workers is not None:
+            self.settings.worker_processes = arguments.workers
+        if arguments.isotope_library is not None:
+            self.settings.isotope_library = arguments.isotope_library or None
+
+    def run(self, quiet=False):
+        """Run the batch process and return it, or None without spectra.
+        """
+        progress_window = ConsoleProgressWindow(
+                None if quiet else sys.stderr)
+        batch_process = BatchProcess(self, progress_window)
+
+        # A shard without files still writes its (empty) partial
+        # summary file, so only an empty data folder is an error
+        data_folder = Path(self.process_parameters.data_folder)
+        if not any(any(data_folder.glob(filetype)) for filetype in
+                   batch_process.calibration_filetypes +
+                   batch_process.quantitation_filetypes):
+            return None
+        batch_process.batch_process()
+        return batch_process
+
+
+def shard_argument(value):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+            prog='python -m MassyTools.cli',
+            description='Calibrate and quantify all mass spectra in a '
+                        'folder without the graphical interface.',
+            epilog=EXIT_CODES,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-d', '--data-folder', type=Path,
+                        help='folder with the mass spectra to process')
+    parser.add_argument('-c', '--calibration-file', type=Path,
+                        help='calibrant list, omit to skip calibration')
+    parser.add_argument('-a', '--analyte-file', type=Path,
+                        help='analyte list, omit to skip quantitation')
+    parser.add_argument('-s', '--settings', type=Path,
+                        help='settings file (default: MassyTools.ini in '
+                             'the working directory)')
+    parser.add_argument('-o', '--output', action='append',
+                        choices=OUTPUT_FIELDS,
+                        help='output to include in the summary, can be '
+                             'repeated (default: the outputs selected in '
+                             'the settings file)')
+    parser.add_argument('-b', '--blocks', type=Path, default=BLOCK_FOLDER,
+                        help='folder with the building block files')
+    parser.add_argument('-m', '--batch-mode', choices=BATCH_MODES,
+                        help='overrides the batch mode of the settings')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='number of worker processes of the parallel '
+                             'batch mode (default: the settings file, 0 '
+                             'uses one per core)')
+    parser.add_argument('--isotope-library',
+                        help='isotopic pattern library file, an empty '
+                             'value disables the library')
+    parser.add_argument('--shard', type=shard_argument, metavar='K/N',
+                        help='only process shard K of N of the files and '
+                             'write a partial summary file')
+    parser.add_argument('--merge', nargs='+', type=Path, metavar='PARTIAL',
+                        help='merge the partial summary files of all '
+                             'shards into a summary file, instead of '
+                             'processing a batch')
+    parser.add_argument('--summary-file', type=Path,
+                        help='summary file written by --merge (default: '
+                             'a new summary file next to the first partial '
+                             'file)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not report progress')
+    parser.add_argument('--log-level', default='WARNING',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='level of the messages written to stderr')
+    return parser
+
+
+def check_arguments(parser, arguments):
+    if arguments.merge:
+        for path in arguments.merge:
+            if not path.is_file():
+                parser.error(str(path)+' does not exist')
+        return
+    if arguments.summary_file:
+        parser.error('--summary-file can only be used with --merge')
+    if not arguments.data_folder:
+        parser.error('--data-folder is required')
+    if not arguments.data_folder.is_dir():
+        parser.error(str(arguments.data_folder)+' is not a folder')
+    if not arguments.calibration_file and not arguments.analyte_file:
+        parser.error('at least one of --calibration-file and '
+                     '--analyte-file is required')
+    for path in (arguments.calibration_file, arguments.analyte_file,
+                 arguments.settings):
+        if path and not path.is_file():
+            parser.error(str(path)+' does not exist')
+    if not arguments.blocks.is_dir():
+        parser.error(str(arguments.blocks)+' is not a folder')
+    if arguments.workers is not None and arguments.workers < 0:
+        parser.error('--workers can not be negative')
+
+
+def merge(arguments):
+    """Merge the partial summary files and return the exit code.
+    """
+    summary_file = arguments.summary_file
+    if summary_file is None:
+        summary_file = arguments.merge[0].parent / (
+                datetime.utcnow().strftime('%Y-%m-%d %H%M')+'_summary.txt')
+    missing = merge_partial_files(arguments.merge, summary_file)
+    print(summary_file)
+    if missing:
+        return EXIT_ERRORS
+    return EXIT_SUCCESS
+
+
+def main(argv=None):
+    parser = get_parser()
+    try:
+        arguments = parser.parse_args(argv)
+        check_arguments(parser, arguments)
+    except SystemExit as e:
+        return EXIT_USAGE if e.code else EXIT_SUCCESS
+
+    logging.basicConfig(
+            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+            datefmt='%Y-%m-%d %H:%M', level=arguments.log_level)
+    logger = logging.getLogger(__name__)
+
+    if arguments.merge:
+        try:
+            return merge(arguments)
+        except (OSError, ValueError) as e:
+            logger.error('Merging the partial summary files failed: '+str(e))
+            return EXIT_FAILURE
+
+    error_counter = ErrorCounter()
+    logging.getLogger().addHandler(error_counter)
+
+    try:
+        command_line = CommandLine(arguments)
+        batch_process = command_line.run(arguments.quiet)
+    except Exception:
+        logger.exception('Batch process aborted')
+        return EXIT_FAILURE
+    finally:
+        logging.getLogger().removeHandler(error_counter)
+
+    if batch_process is None:
+        logger.error('No mass spectra found in '+str(arguments.data_folder))
+        return EXIT_NO_DATA
+    if batch_process.output is not None:
+        print(batch_process.output.get_output_file())
+    if error_counter.count:
+        return EXIT_ERRORS
+    return EXIT_SUCCESS
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,7 +15,7 @@ class BatchProcessProgressWindow(object):
         top.title('Batch Process Progress Window')
 
         if self.process_parameters.calibration_file or \
-                self.process.quantitation_file:
+                self.process_parameters.quantitation_file:
             reading_label = tk.Label(top, text='Data Reading')
             reading_label.pack(fill='both', expand=True)
             reading_progress_bar = ProgressBar(top)
@@ -0,0 +1,77 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+
+def polynomial_baseline(x_data, y_data, window=None):
+    y_average = np.average(y_data)
+    y_std = np.std(y_data)
+
+    subset = ((y_data >= y_average-y_std) &
+              (y_data <= y_average+y_std))
+
+    p = np.polynomial.polynomial.polyfit(x_data[subset], y_data[subset], 3)
+    f = np.polynomial.polynomial.Polynomial(p)
+    return f(x_data)
+
+def rolling_minimum(y_data, window):
+    """Return the centered minimum of every run of window points.
+    """
+    half_window = window // 2
+    window = 2*half_window + 1
+    padded = np.pad(y_data, (half_window, half_window), mode='edge')
+    number_blocks = -(-len(padded) // window)
+    blocks = np.full(number_blocks*window, np.inf)
+    blocks[:len(padded)] = padded
+    blocks = blocks.reshape(number_blocks, window)
+    prefix = np.minimum.accumulate(blocks, axis=1).ravel()
+    suffix = np.minimum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.minimum(suffix[:len(y_data)],
+                      prefix[window-1:window-1+len(y_data)])
+
+def rolling_minimum_baseline(x_data, y_data, window):
+    """Return the morphological opening of the intensities.
+    """
+    erosion = rolling_minimum(y_data, window)
+    return -rolling_minimum(-erosion, window)
+
+def snip_baseline(x_data, y_data, window):
+    """Return the SNIP baseline of the intensities.
+    """
+    offset = min(np.min(y_data), 0.)
+    v = np.log(np.log(np.sqrt(y_data - offset + 1) + 1) + 1)
+    for p in range(1, window // 2 + 1):
+        if 2*p >= len(v):
+            break
+        v[p:-p] = np.minimum(v[p:-p], (v[:-2*p] + v[2*p:]) / 2)
+    return (np.exp(np.exp(v) - 1) - 1)**2 - 1 + offset
+
+BASELINE_METHODS = {
+    'polynomial': polynomial_baseline,
+    'rolling_minimum': rolling_minimum_baseline,
+    'snip': snip_baseline,
+}
+
+def correct_baseline(x_data, y_data, method='polynomial', window=500):
+    """Return the intensities with the baseline of method subtracted.
+    """
+    try:
+        baseline = BASELINE_METHODS[method]
+    except KeyError:
+        raise ValueError('Unknown baseline method: '+str(method))
+    x_data = np.asarray(x_data, dtype=np.float64)
+    y_data = np.asarray(y_data, dtype=np.float64)
+    return y_data - baseline(x_data, y_data, int(window))
+
+def correct_baselines(data, method='polynomial', window=500, processes=1):
+    """Yield the index and corrected intensities of every spectrum in data.
+    """
+    if processes > 1 and len(data) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {executor.submit(correct_baseline, x_data, y_data,
+                                       method, window): index for
+                       index, (x_data, y_data) in enumerate(data)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    else:
+        for index, (x_data, y_data) in enumerate(data):
+            yield index, correct_baseline(x_data, y_data, method, window)
@@ -1,13 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from MassyTools.bin.isotope_pattern_cache import IsotopePatternCache
 from MassyTools.bin.mass_spectrum import MassSpectrum
 from MassyTools.bin.output import Output
-from MassyTools.gui.batch_process_progress_window import BatchProcessProgressWindow
+from MassyTools.util.batch_worker import (BatchWorker, get_worker_processes,
+                                          process_files)
 from MassyTools.util.functions import get_peak_list
+from MassyTools.util.pipeline import Pipeline
+from MassyTools.util.shards import select_shard
 
 
 class BatchProcess(object):
-    def __init__(self, master):
+    def __init__(self, master, progress_window=None):
         self.master = master
         self.process_parameters = master.process_parameters
         self.output_parameters = master.output_parameters
@@ -16,14 +21,17 @@ class BatchProcess(object):
         self.settings = master.settings
         self.logger = master.logger
         self.axes = master.axes  # Should refactor to not need this
-
+        self.isotope_cache = IsotopePatternCache(
+                self.building_blocks, self.settings.isotope_library)
 
         # Placeholders
         self.reference = None
         self.files = None
         self.filename = None
-        self.process_window = None
+        self.process_window = progress_window
         self.mass_spectra = None
+        self.pipeline_statistics = None
+        self.output = None
 
         # Batch process specific settings
         self.calibration_filetypes = ['*.xy']
@@ -33,86 +41,225 @@ class BatchProcess(object):
     def batch_process(self):
         if self.process_parameters.data_folder:
 
-            # Progress Window
-            self.process_window = BatchProcessProgressWindow(self)
+            # Progress Window, tk is only imported when no other
+            # progress window was given
+            if self.process_window is None:
+                from MassyTools.gui.batch_process_progress_window import (
+                    BatchProcessProgressWindow)
+                self.process_window = BatchProcessProgressWindow(self)
             self.process_window.create_window()
 
-            # Calibration
-            if self.process_parameters.calibration_file:
-                self.process_parameters.calibration = True
+            if self.settings.batch_mode == 'streaming':
+                self.stream_process()
+            elif self.settings.batch_mode == 'parallel':
+                self.parallel_process()
+            elif self.settings.batch_mode == 'pipeline':
+                self.pipeline_process()
+            else:
+                self.phased_process()
+
+            self.isotope_cache.save_library()
+
+    def phased_process(self):
+        """Read all files, then calibrate, quantify and report on all of them.
+        """
+        # Calibration
+        if self.process_parameters.calibration_file:
+            self.process_parameters.calibration = True
+
+            self.peak_list = get_peak_list(
+                    self.process_parameters.calibration_file)
+            self.files = self.get_calibration_files()
+
+            # Read data
+            self.read_data()
+
+            # Perform calibration
+            progress = self.process_window.calibration_progress_bar
+            for index, mass_spectrum in enumerate(self.mass_spectra):
+                progress.counter.set(
+                        (float(index) / len(self.mass_spectra))*100)
+                progress.update_progress_bar()
+                mass_spectrum.process_mass_spectrum()
+                mass_spectrum.calibrate()
+            progress.fill_bar()
+
+            # Wrap up
+            self.process_parameters.calibration = False
+
+        # Quantitation
+        if self.process_parameters.quantitation_file:
+            self.process_parameters.quantitation = True
 
-                self.peak_list = get_peak_list(
-                        self.process_parameters.calibration_file)
-                self.files = self.get_calibration_files()
+            self.peak_list = get_peak_list(
+                    self.process_parameters.quantitation_file)
 
-                # Read data
+            # Read data
+            if self.mass_spectra is None:
+                self.files = self.get_quantitation_files()
                 self.read_data()
 
-                # Perform calibration
-                progress = self.process_window.calibration_progress_bar
-                for index, mass_spectrum in enumerate(self.mass_spectra):
-                    progress.counter.set(
-                            (float(index) / len(self.mass_spectra))*100)
-                    progress.update_progress_bar()
-                    mass_spectrum.process_mass_spectrum()
-                    mass_spectrum.calibrate()
-                progress.fill_bar()
-
-                # Wrap up
-                self.process_parameters.calibration = False
-
-            # Quantitation
-            if self.process_parameters.quantitation_file:
-                self.process_parameters.quantitation = True
-
-                self.peak_list = get_peak_list(
-                        self.process_parameters.quantitation_file)
+            # Perform quantitation
+            progress = self.process_window.quantitation_progress_bar
+            for index, mass_spectrum in enumerate(self.mass_spectra):
+                progress.counter.set(
+                        (float(index) / len(self.mass_spectra))*100)
+                progress.update_progress_bar()
+                mass_spectrum.process_mass_spectrum()
+                mass_spectrum.quantify_mass_spectrum()
+            progress.fill_bar()
+
+            # Generate summary file
+            output = Output(self)
+            output.init_output_file()
+            for filename, mass_spectrum in zip(self.files,
+                                               self.mass_spectra):
+                output.add_mass_spectrum(mass_spectrum, filename)
+            output.build_output_file()
+            self.output = output
+
+            # Wrap up
+            self.process_parameters.quantitation = False
+
+        # Report generation
+        if self.output_parameters.pdf_report.get() == True:
+            progress = self.process_window.report_progress_bar
+            for index, mass_spectrum in enumerate(self.mass_spectra):
+                progress.counter.set(
+                        (float(index) / len(self.mass_spectra))*100)
+                progress.update_progress_bar()
+                mass_spectrum.generate_pdf_report()
+            progress.fill_bar()
+
+    def stream_process(self):
+        """Process the files one at a time, keeping only their summary rows.
+        """
+        batch_worker, output = self.get_worker()
+        progress_bars = self.get_progress_bars(batch_worker)
+
+        for index, filename in enumerate(self.files):
+            for progress in progress_bars:
+                progress.counter.set((float(index) / len(self.files))*100)
+                progress.update_progress_bar()
+            result = batch_worker.process_file(filename)
+            if output and result is not None:
+                output.add_result(result, filename)
+
+        for progress in progress_bars:
+            progress.fill_bar()
+
+        if output:
+            output.build_output_file()
+
+    def parallel_process(self):
+        """Process the files in a pool of worker processes.
+        """
+        batch_worker, output = self.get_worker()
+        progress_bars = self.get_progress_bars(batch_worker)
+
+        results = [None] * len(self.files)
+        processes = get_worker_processes(self.settings)
+        for count, (index, result) in enumerate(process_files(
+                batch_worker, self.files, processes)):
+            results[index] = result
+            for progress in progress_bars:
+                progress.counter.set(
+                        (float(count+1) / len(self.files))*100)
+                progress.update_progress_bar()
+
+        for progress in progress_bars:
+            progress.fill_bar()
+
+        if output:
+            for filename, result in zip(self.files, results):
+                if result is not None:
+                    output.add_result(result, filename)
+            output.build_output_file()
+
+    def pipeline_process(self):
+        """Process the files in a pipeline of concurrent stages.
+        """
+        batch_worker, output = self.get_worker()
+        progress_bars = self.get_progress_bars(batch_worker)
+
+        def update_progress(count):
+            for progress in progress_bars:
+                progress.counter.set((float(count) / len(self.files))*100)
+                progress.update_progress_bar()
+
+        pipeline = Pipeline(batch_worker, self.settings.reading_threads,
+                            self.settings.pipeline_threads,
+                            self.settings.pipeline_queue_size)
+        results = pipeline.run(self.files, update_progress)
+        self.pipeline_statistics = pipeline.statistics
+
+        for progress in progress_bars:
+            progress.fill_bar()
+
+        if output:
+            for filename, result in zip(self.files, results):
+                if result is not None:
+                    output.add_result(result, filename)
+            output.build_output_file()
+
+    def get_worker(self):
+        """Return a BatchWorker and the Output for its results.
+        """
+        calibration_peaks = None
+        quantitation_peaks = None
+        output = None
+        if self.process_parameters.calibration_file:
+            calibration_peaks = get_peak_list(
+                    self.process_parameters.calibration_file)
+            self.files = self.get_calibration_files()
+        if self.process_parameters.quantitation_file:
+            quantitation_peaks = get_peak_list(
+                    self.process_parameters.quantitation_file)
+            if not calibration_peaks:
                 self.files = self.get_quantitation_files()
+            output = Output(self)
+            output.init_output_file()
+            self.output = output
+
+        batch_worker = BatchWorker(
+                self.settings, self.building_blocks, self.isotope_cache,
+                self.output_parameters.get_values(), calibration_peaks,
+                quantitation_peaks)
+        return batch_worker, output
 
-                # Read data
-                if not self.mass_spectra:
-                    self.mass_spectra = self.read_data()
-
-                # Perform quantitation
-                progress = self.process_window.quantitation_progress_bar
-                for index, mass_spectrum in enumerate(self.mass_spectra):
-                    progress.counter.set(
-                            (float(index) / len(self.mass_spectra))*100)
-                    progress.update_progress_bar()
-                    mass_spectrum.process_mass_spectrum()
-                    mass_spectrum.quantify_mass_spectrum()
-                progress.fill_bar()
-
-                # Generate summary file
-                output = Output(self)
-                output.init_output_file()
-                output.build_output_file()
-
-                # Wrap up
-                self.process_parameters.quantitation = False
-
-            # Report generation
-            if self.output_parameters.pdf_report.get() == True:
-                progress = self.process_window.report_progress_bar
-                for index, mass_spectrum in enumerate(self.mass_spectra):
-                    progress.counter.set(
-                            (float(index) / len(self.mass_spectra))*100)
-                    progress.update_progress_bar()
-                    mass_spectrum.generate_pdf_report()
-                progress.fill_bar()
+    def get_progress_bars(self, batch_worker):
+        progress_bars = [self.process_window.reading_progress_bar]
+        if batch_worker.calibration_peaks:
+            progress_bars.append(self.process_window.calibration_progress_bar)
+        if batch_worker.quantitation_peaks:
+            progress_bars.append(
+                    self.process_window.quantitation_progress_bar)
+        if self.output_parameters.pdf_report.get() == True:
+            progress_bars.append(self.process_window.report_progress_bar)
+        return progress_bars
 
     def read_data(self):
+        """Open all files concurrently, skipping the files without data.
+        """
         data = []
-        progress = self.process_window.reading_progress_bar
-        for index, filename in enumerate(self.files):
-            progress.counter.set((float(index) / len(self.files))*100)
-            progress.update_progress_bar()
+        for filename in self.files:
             self.filename = Path(filename)
-            mass_spectrum = MassSpectrum(self)
-            mass_spectrum.open_mass_spectrum()
-            data.append(mass_spectrum)
+            data.append(MassSpectrum(self))
+
+        progress = self.process_window.reading_progress_bar
+        with ThreadPoolExecutor(
+                max_workers=self.settings.reading_threads) as executor:
+            futures = [executor.submit(mass_spectrum.open_mass_spectrum)
+                       for mass_spectrum in data]
+            for index, future in enumerate(as_completed(futures)):
+                future.result()
+                progress.counter.set((float(index+1) / len(self.files))*100)
+                progress.update_progress_bar()
         progress.fill_bar()
-        self.mass_spectra = data
+        self.files = [filename for filename, mass_spectrum in
+                      zip(self.files, data) if mass_spectrum.x_data is not None]
+        self.mass_spectra = [mass_spectrum for mass_spectrum in data
+                             if mass_spectrum.x_data is not None]
 
     def get_calibration_files(self):
         calibration_files = []
@@ -120,17 +267,14 @@ class BatchProcess(object):
             for file in Path(
                     self.process_parameters.data_folder).glob(files):
                 if file not in self.exclusion_files:
-                    calibration_files.append(Path(
-                            self.process_parameters.data_folder) /
-                            file)
-        return calibration_files
+                    calibration_files.append(file)
+        return select_shard(calibration_files, self.process_parameters.shard)
 
     def get_quantitation_files(self):
         quantitation_files = []
         for files in self.quantitation_filetypes:
             for file in Path(self.process_parameters.data_folder).glob(files):
                 if file not in self.exclusion_files:
-                    quantitation_files.append(Path(
-                            self.process_parameters.data_folder) /
-                            file)
-        return quantitation_files
+                    quantitation_files.append(file)
+        return select_shard(quantitation_files,
+                            self.process_parameters.shard)
@@ -0,0 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import logging
+import os
+from pathlib import Path
+
+from MassyTools.bin.mass_spectrum import MassSpectrum
+from MassyTools.bin.output import Output
+from MassyTools.bin.process_parameters import ProcessParameters
+
+
+class BatchWorker(object):
+    """Takes single files through calibration, quantitation and reporting.
+    """
+    def __init__(self, settings, building_blocks, isotope_cache,
+                 output_parameters, calibration_peaks=None,
+                 quantitation_peaks=None):
+        self.settings = settings
+        self.building_blocks = building_blocks
+        self.isotope_cache = isotope_cache
+        self.output_parameters = output_parameters
+        self.calibration_peaks = calibration_peaks
+        self.quantitation_peaks = quantitation_peaks
+        self.process_parameters = ProcessParameters()
+        self.logger = logging.getLogger(__name__)
+        self.output = Output(self)
+
+        # Placeholders
+        self.axes = None
+        self.filename = None
+        self.peak_list = None
+        self.mass_spectra = []
+
+    def process_file(self, filename):
+        """Return the summary result of filename, or None.
+        """
+        mass_spectrum = self.open_file(filename)
+        if mass_spectrum is None:
+            return None
+        result = self.compute_file(mass_spectrum)
+        self.report_file(mass_spectrum)
+        return result
+
+    def open_file(self, filename):
+        """Return the opened mass spectrum of filename, or None without data.
+        """
+        context = copy.copy(self)
+        context.filename = Path(filename)
+        context.process_parameters = ProcessParameters()
+        mass_spectrum = MassSpectrum(context)
+        mass_spectrum.open_mass_spectrum()
+        if mass_spectrum.x_data is None:
+            return None
+        return mass_spectrum
+
+    def compute_file(self, mass_spectrum):
+        """Calibrate and quantify mass_spectrum, returning its summary result.
+        """
+        context = mass_spectrum.master
+        if self.calibration_peaks:
+            context.process_parameters.calibration = True
+            context.peak_list = self.calibration_peaks
+            mass_spectrum.process_mass_spectrum()
+            mass_spectrum.calibrate()
+            context.process_parameters.calibration = False
+
+        result = None
+        if self.quantitation_peaks:
+            context.process_parameters.quantitation = True
+            context.peak_list = self.quantitation_peaks
+            mass_spectrum.process_mass_spectrum()
+            mass_spectrum.quantify_mass_spectrum()
+            result = self.output.get_result(mass_spectrum)
+            context.process_parameters.quantitation = False
+        return result
+
+    def report_file(self, mass_spectrum):
+        if self.output_parameters.pdf_report.get() == True:
+            mass_spectrum.generate_pdf_report()
+
+
+# The worker of a pool process, set once by init_worker
+worker = None
+
+def init_worker(batch_worker):
+    global worker
+    worker = batch_worker
+
+def process_file(filename):
+    return worker.process_file(filename)
+
+def get_worker_processes(settings):
+    return settings.worker_processes or os.cpu_count() or 1
+
+def process_files(batch_worker, files, processes=1):
+    """Yield the index and result of every file as it is completed.
+    """
+    if processes > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=init_worker,
+                                 initargs=(batch_worker,)) as executor:
+            futures = {executor.submit(process_file, filename): index
+                       for index, filename in enumerate(files)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    else:
+        for index, filename in enumerate(files):
+            yield index, batch_worker.process_file(filename)
@@ -1,4 +1,4 @@
-from sklearn.cluster import DBSCAN
+import numpy as np
 from pathlib import PurePath
 
 
@@ -17,6 +17,7 @@ def classify_mass_spectra(mass_spectra):
 
 
 def density_based_spatial_clustering(data):
+    from sklearn.cluster import DBSCAN
     clustering = DBSCAN(eps=3, min_samples=2).fit(data)
     return clustering
 
@@ -25,9 +26,7 @@ def normalize_intensity(mass_spectra):
     data = []
 
     for mass_spectrum in mass_spectra:
-        _, _y = zip(*mass_spectrum.data)
-        max_y = max(_y)
-        norm_y = [x / max_y for x in _y]
+        norm_y = mass_spectrum.y_data / np.max(mass_spectrum.y_data)
         data.append(norm_y)
 
     return data
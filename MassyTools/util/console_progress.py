@@ -0,0 +1,56 @@
+import sys
+
+from MassyTools.bin.output_parameters import Value
+
+
+class ConsoleProgressBar(object):
+    """Progress bar that writes its percentage to a text stream.
+    """
+    def __init__(self, label, stream=None, step=10):
+        self.label = label
+        self.stream = stream
+        self.step = step
+        self.counter = Value(0.)
+        self.reported = None
+
+    def reset_bar(self):
+        self.counter.set(0.)
+        self.reported = None
+
+    def update_progress_bar(self):
+        progress = float(self.counter.get())
+        if self.reported is None or progress - self.reported >= self.step:
+            self.report(progress)
+
+    def fill_bar(self):
+        self.counter.set(100.)
+        if self.reported != 100.:
+            self.report(100.)
+
+    def report(self, progress):
+        self.reported = progress
+        if self.stream is not None:
+            self.stream.write(self.label+': '+'{0:.0f}'.format(progress) +
+                              '%\n')
+            self.stream.flush()
+
+
+class ConsoleProgressWindow(object):
+    """Headless replacement for the batch process progress window.
+    """
+    def __init__(self, stream=sys.stderr, step=10):
+        self.stream = stream
+        self.step = step
+
+    def create_window(self):
+        self.reading_progress_bar = ConsoleProgressBar(
+                'Data Reading', self.stream, self.step)
+        self.calibration_progress_bar = ConsoleProgressBar(
+                'Calibration', self.stream, self.step)
+        self.quantitation_progress_bar = ConsoleProgressBar(
+                'Quantitation', self.stream, self.step)
+        self.report_progress_bar = ConsoleProgressBar(
+                'PDF Report Generation', self.stream, self.step)
+
+    def close(self):
+        pass
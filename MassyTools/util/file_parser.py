@@ -1,9 +1,82 @@
 from pathlib import Path
+import io
+import logging
+import time
+import numpy as np
+
+from MassyTools.util.spectrum_cache import hash_data
+
+logger = logging.getLogger(__name__)
+
+HEADER_SIZE = 4096
+
+def read_header(filename):
+    with Path(filename).open('rb') as fr:
+        header = fr.read(HEADER_SIZE)
+    return header.decode('latin-1')
+
+def get_reader(filename):
+    """Return the (name, reader) of the format of filename, or None.
+    """
+    header = read_header(filename)
+    for name, detector, reader in readers:
+        if detector(header):
+            return name, reader
+    return None
+
+def register_reader(name, detector, reader):
+    """Add a file format with its detector and reader to the registry.
+    """
+    readers.append((name, detector, reader))
+
+def detect_xy_spectrum(header):
+    lines = header.splitlines()
+    # The last line can be truncated by the header size
+    if len(header) == HEADER_SIZE:
+        lines = lines[:-1]
+    for line in lines:
+        columns = line.split()
+        if not columns:
+            continue
+        if len(columns) < 2:
+            return False
+        try:
+            [float(column) for column in columns]
+        except ValueError:
+            return False
+        return True
+    return False
 
 def open_xy_spectrum(master):
-    data_buffer = []
-    with Path(master.filename).open() as fr:
-        for line in fr:
-            line = line.rstrip().split()
-            data_buffer.append((float(line[0]), float(line[-1])))
-    master.data = data_buffer
+    """Read an XY file into the x_data and y_data arrays of master.
+    """
+    start = time.perf_counter()
+    with Path(master.filename).open('rb') as fr:
+        raw_data = fr.read()
+    master.file_hash = hash_data(raw_data)
+    with io.StringIO(raw_data.decode('latin-1')) as fr:
+        columns = []
+        while not columns:
+            line = fr.readline()
+            if not line:
+                raise ValueError(str(master.filename)+' contains no data')
+            columns = line.split()
+        fr.seek(0)
+        data = np.loadtxt(fr, dtype=np.float64,
+                          usecols=(0, len(columns)-1), ndmin=2)
+    master.x_data = np.ascontiguousarray(data[:, 0])
+    master.y_data = np.ascontiguousarray(data[:, -1])
+    log_parse_throughput(master.filename, len(data),
+                         time.perf_counter()-start)
+
+def log_parse_throughput(filename, number_points, elapsed):
+    size = Path(filename).stat().st_size / 1e6
+    elapsed = max(elapsed, 1e-9)
+    logger.info(str(Path(filename).name)+': parsed '+str(number_points) +
+                ' points in '+'{0:.3f}'.format(elapsed)+' s ('+
+                '{0:.1f}'.format(size / elapsed)+' MB/s, '+
+                '{0:.0f}'.format(number_points / elapsed)+' points/s)')
+
+readers = [
+    ('xy', detect_xy_spectrum, open_xy_spectrum),
+]
@@ -1,5 +1,29 @@
 from pathlib import Path
-import math
+import numpy as np
+
+def read_building_blocks(block_folder):
+    building_blocks = {}
+    for file in Path(block_folder).glob('*.block'):
+        block = Path(file).stem
+        keys = []
+        values = []
+        with open(file, 'r') as fr:
+            for line in fr:
+                foo = line.rstrip().split()
+                key = foo[0]
+                value = " ".join(foo[1:])
+                keys.append(key)
+                try:
+                    float(value)
+                    try:
+                        value = int(value)
+                    except ValueError:
+                        value = float(value)
+                except ValueError:
+                    value = str(value)
+                values.append(value)
+        building_blocks[block] = dict(zip(keys, values))
+    return building_blocks
 
 def get_peak_list(file_handle):
     peaks = []
@@ -9,18 +33,23 @@ def get_peak_list(file_handle):
             peaks.append({'name':str(line[0])})
     return peaks
 
-def calculate_elemental_isotopic_pattern(element, number):
+def calculate_elemental_isotopic_pattern(element, number,
+                                         min_contribution=0.0001):
+    """Return the (mass increments, fractions) of element over number atoms.
+    """
+    masses = []
     fractions = []
-    for i in element:
-        last_fraction = 0.
-        j = 0
-        while j <= number:
-            nCk = math.factorial(number) / (math.factorial(j) * math.factorial(number - j))
-            f = nCk * i[1]**j * (1 - i[1])**(number-j)
-            fractions.append((i[2]*j, f))
-            j += 1
-            # use min_contribution from settings
-            if f <= 0.0001 and f < last_fraction:
-                break
-            last_fraction = f
-    return fractions
+    for _, abundance, mass_increment in element:
+        j = np.arange(number+1)
+        log_coefficients = np.concatenate(([0.], np.cumsum(
+            np.log(number-j[:-1]) - np.log(j[:-1]+1))))
+        f = np.exp(log_coefficients + j*np.log(abundance) +
+                   (number-j)*np.log1p(-abundance))
+        cutoff = np.flatnonzero((f[1:] <= min_contribution) &
+                                (f[1:] < f[:-1]))
+        if len(cutoff):
+            f = f[:cutoff[0]+2]
+            j = j[:cutoff[0]+2]
+        masses.append(mass_increment*j)
+        fractions.append(f)
+    return np.concatenate(masses), np.concatenate(fractions)
@@ -0,0 +1,162 @@
+import logging
+import queue
+import threading
+import time
+
+
+class MonitoredQueue(queue.Queue):
+    """Bounded queue that records its depth and the time spent waiting.
+    """
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.lock = threading.Lock()
+        self.put_stall = 0.
+        self.get_stall = 0.
+        self.max_depth = 0
+        self.total_depth = 0
+        self.number_puts = 0
+
+    def put(self, item):
+        start = time.perf_counter()
+        super().put(item)
+        depth = self.qsize()
+        with self.lock:
+            self.put_stall += time.perf_counter() - start
+            self.max_depth = max(self.max_depth, depth)
+            self.total_depth += depth
+            self.number_puts += 1
+
+    def get(self):
+        start = time.perf_counter()
+        item = super().get()
+        with self.lock:
+            self.get_stall += time.perf_counter() - start
+        return item
+
+    def get_statistics(self):
+        return {'max_depth': self.max_depth,
+                'average_depth': (self.total_depth / self.number_puts if
+                                  self.number_puts else 0.),
+                'put_stall': self.put_stall,
+                'get_stall': self.get_stall}
+
+
+class Pipeline(object):
+    """Reads, computes and reports files in concurrent stages.
+    """
+    def __init__(self, batch_worker, reading_threads=1, compute_threads=1,
+                 queue_size=4):
+        self.batch_worker = batch_worker
+        self.logger = logging.getLogger(__name__)
+        self.reading_threads = max(1, reading_threads)
+        self.compute_threads = max(1, compute_threads)
+        self.queue_size = max(1, queue_size)
+        self.statistics = {}
+
+    def run(self, files, callback=None):
+        """Process files and return their results in the order of files.
+        """
+        file_queue = queue.Queue()
+        read_queue = MonitoredQueue(self.queue_size)
+        compute_queue = MonitoredQueue(self.queue_size)
+        for item in enumerate(files):
+            file_queue.put(item)
+        for _ in range(self.reading_threads):
+            file_queue.put(None)
+
+        active_readers = [self.reading_threads]
+        active_computers = [self.compute_threads]
+        lock = threading.Lock()
+        failures = {}
+
+        def fail(index, error):
+            with lock:
+                failures[index] = error
+
+        def read():
+            while True:
+                item = file_queue.get()
+                if item is None:
+                    break
+                index, filename = item
+                mass_spectrum = None
+                if not failures:
+                    try:
+                        mass_spectrum = self.batch_worker.open_file(filename)
+                    except Exception as e:
+                        fail(index, e)
+                read_queue.put((index, mass_spectrum))
+            with lock:
+                active_readers[0] -= 1
+                last = active_readers[0] == 0
+            if last:
+                for _ in range(self.compute_threads):
+                    read_queue.put(None)
+
+        def compute():
+            while True:
+                item = read_queue.get()
+                if item is None:
+                    break
+                index, mass_spectrum = item
+                result = None
+                if mass_spectrum is not None:
+                    try:
+                        result = self.batch_worker.compute_file(mass_spectrum)
+                    except Exception as e:
+                        fail(index, e)
+                        mass_spectrum = None
+                compute_queue.put((index, mass_spectrum, result))
+            with lock:
+                active_computers[0] -= 1
+                last = active_computers[0] == 0
+            if last:
+                compute_queue.put(None)
+
+        threads = ([threading.Thread(target=read, daemon=True) for _ in
+                    range(self.reading_threads)] +
+                   [threading.Thread(target=compute, daemon=True) for _ in
+                    range(self.compute_threads)])
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        results = [None] * len(files)
+        count = 0
+        while True:
+            item = compute_queue.get()
+            if item is None:
+                break
+            index, mass_spectrum, result = item
+            results[index] = result
+            if mass_spectrum is not None:
+                try:
+                    self.batch_worker.report_file(mass_spectrum)
+                except Exception as e:
+                    fail(index, e)
+            count += 1
+            if callback:
+                callback(count)
+
+        for thread in threads:
+            thread.join()
+        self.statistics = {'elapsed': time.perf_counter() - start,
+                           'read_queue': read_queue.get_statistics(),
+                           'compute_queue': compute_queue.get_statistics()}
+        self.log_statistics()
+        if failures:
+            raise failures[min(failures)]
+        return results
+
+    def log_statistics(self):
+        message = ('Pipeline finished in '+'{0:.3f}'.format(
+                   self.statistics['elapsed'])+' s')
+        for name in ('read_queue', 'compute_queue'):
+            statistics = self.statistics[name]
+            message += ('; '+name+': max depth '+str(
+                        statistics['max_depth'])+', average depth '+
+                        '{0:.2f}'.format(statistics['average_depth'])+
+                        ', put stall '+'{0:.3f}'.format(
+                        statistics['put_stall'])+' s, get stall '+
+                        '{0:.3f}'.format(statistics['get_stall'])+' s')
+        self.logger.info(message)
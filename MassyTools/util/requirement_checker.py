@@ -1,27 +1,37 @@
+import re
 import sys
-from pkg_resources import parse_version
+from importlib.metadata import PackageNotFoundError, version
+
+REQUIREMENTS = [
+    ('matplotlib', 'Matplotlib', '2.2.3'),
+    ('numpy', 'NumPy', '1.15.1'),
+    ('scipy', 'SciPy', '1.1.0'),
+]
+
+def parse_version(version_string):
+    """Return the leading numerical components of a version string.
+    """
+    numbers = []
+    for component in version_string.split('.'):
+        match = re.match(r'\d+', component)
+        if not match:
+            break
+        numbers.append(int(match.group()))
+        if match.end() != len(component):
+            break
+    return tuple(numbers)
 
 def check_requirements():
+    """Check the installed versions without importing the packages.
+    """
     if sys.version_info[0] < 3:
         raise Exception("Must be using Python 3")
 
-    try:
-        import matplotlib
-        if parse_version(matplotlib.__version__) < parse_version('2.2.3'):
-            raise Exception("Matplotlib requires version 2.2.3 or newer")
-    except ModuleNotFoundError:
-        raise Exception("Matplotlib not installed")
-
-    try:
-        import numpy
-        if parse_version(numpy.__version__) < parse_version('1.15.1'):
-            raise Exception("NumPy requires version 1.15.1 or newer")
-    except ModuleNotFoundError:
-        raise Exception("NumPy not installed")
-
-    try:
-        import scipy
-        if parse_version(scipy.__version__) < parse_version('1.1.0'):
-            raise Exception("SciPy requires version 1.1.0 or newer")
-    except ModuleNotFoundError:
-        raise Exception("SciPy not installed")
+    for package, name, minimum_version in REQUIREMENTS:
+        try:
+            installed_version = version(package)
+        except PackageNotFoundError:
+            raise Exception(name+" not installed")
+        if parse_version(installed_version) < parse_version(minimum_version):
+            raise Exception(name+" requires version "+minimum_version+
+                            " or newer")
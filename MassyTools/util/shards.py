@@ -0,0 +1,93 @@
+import json
+import logging
+from pathlib import Path
+
+from MassyTools.bin.output import PARTIAL_VERSION, write_sections
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(specification):
+    """Return the (k, n) of a 'k/n' shard specification.
+    """
+    try:
+        k, n = (int(value) for value in specification.split('/'))
+    except ValueError:
+        raise ValueError('invalid shard '+repr(specification)+
+                         ', expected k/n')
+    if n < 1 or not 1 <= k <= n:
+        raise ValueError('invalid shard '+repr(specification)+
+                         ', k must be between 1 and n')
+    return k, n
+
+def select_shard(files, shard=None):
+    """Return the files sorted by name, or only those of a (k, n) shard.
+    """
+    files = sorted(files, key=lambda file: (Path(file).name, str(file)))
+    if shard:
+        k, n = shard
+        files = files[k-1::n]
+    return files
+
+def read_partial_file(partial_file):
+    with Path(partial_file).open('r') as fr:
+        partial = json.load(fr)
+    if partial.get('version') != PARTIAL_VERSION:
+        raise ValueError(str(partial_file)+' has partial file version '+
+                         str(partial.get('version'))+', expected '+
+                         str(PARTIAL_VERSION))
+    return partial
+
+def merge_partial_files(partial_files, summary_file):
+    """Merge the partial files into summary_file, return missing shards.
+    """
+    partials = [read_partial_file(partial_file)
+                for partial_file in partial_files]
+    if not partials:
+        raise ValueError('no partial summary files to merge')
+
+    shards = {}
+    count = partials[0]['shard'][1]
+    for partial_file, partial in zip(partial_files, partials):
+        k, n = partial['shard']
+        if n != count:
+            raise ValueError(str(partial_file)+' is shard '+str(k)+' of '+
+                             str(n)+', expected '+str(count)+' shards')
+        if k in shards:
+            raise ValueError('shard '+str(k)+' of '+str(n)+
+                             ' is given more than once')
+        shards[k] = partial
+    missing = [k for k in range(1, count+1) if k not in shards]
+    if missing:
+        logger.error('Missing shard(s) '+', '.join(str(k) for k in missing)+
+                     ' of '+str(count)+', the summary is incomplete')
+
+    # Shards without quantified files do not have any sections
+    partials = [partial for _, partial in sorted(shards.items())]
+    preamble = partials[0]['preamble']
+    if any(partial['preamble'] != preamble for partial in partials):
+        logger.warning('The shards were processed with different '
+                       'parameters, using those of the first shard')
+    quantified = [partial for partial in partials if partial['sections']]
+    titles = None
+    rows = []
+    for partial in quantified:
+        partial_titles = [section['title'] for section in partial['sections']]
+        if titles is None:
+            titles = partial_titles
+        elif partial_titles != titles:
+            raise ValueError('the shards contain different outputs')
+        rows.extend(zip(partial['files'], partial['rows']))
+    rows.sort(key=lambda row: row[0] or '')
+
+    with Path(summary_file).open('w') as fw:
+        fw.write(preamble)
+        if quantified:
+            # The header of the first file matches an unsharded batch
+            first = min(quantified, key=lambda partial: partial['files'][0]
+                        or '')
+            write_sections(fw, [(section['title'], section['header'],
+                                 [row[1][index] for row in rows])
+                                for index, section in
+                                enumerate(first['sections'])])
+    return missing
@@ -0,0 +1,74 @@
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_FOLDER = '.massytools_cache'
+
+def get_cache_files(filename):
+    filename = Path(filename)
+    cache_folder = filename.parent / CACHE_FOLDER
+    return (cache_folder / (filename.name+'.npy'),
+            cache_folder / (filename.name+'.json'))
+
+def hash_data(data):
+    """Return the hash of the contents of a spectrum file.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hash_file(filename):
+    digest = hashlib.blake2b(digest_size=16)
+    with Path(filename).open('rb') as fr:
+        for chunk in iter(lambda: fr.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_cached_spectrum(filename):
+    """Return the cached (x_data, y_data) of filename, or None.
+    """
+    data_file, meta_file = get_cache_files(filename)
+    try:
+        with meta_file.open() as fr:
+            meta_data = json.load(fr)
+        stat = Path(filename).stat()
+        if stat.st_size != meta_data['size']:
+            return None
+        if stat.st_mtime_ns != meta_data['mtime']:
+            if hash_file(filename) != meta_data['hash']:
+                return None
+            meta_data['mtime'] = stat.st_mtime_ns
+            write_meta_data(meta_file, meta_data)
+        data = np.load(data_file, mmap_mode='r')
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug(e)
+        return None
+    return np.asarray(data[0]), np.asarray(data[1])
+
+def save_cached_spectrum(filename, x_data, y_data, file_hash=None):
+    """Write the parsed arrays of filename to its sidecar cache.
+    """
+    data_file, meta_file = get_cache_files(filename)
+    try:
+        stat = Path(filename).stat()
+        if file_hash is None:
+            file_hash = hash_file(filename)
+        meta_data = {'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                     'hash': file_hash}
+        data_file.parent.mkdir(exist_ok=True)
+        temp_file = data_file.with_name(data_file.name+'.tmp')
+        with temp_file.open('wb') as fw:
+            np.save(fw, np.vstack((x_data, y_data)).astype(np.float64))
+        os.replace(temp_file, data_file)
+        write_meta_data(meta_file, meta_data)
+    except OSError as e:
+        logger.warning('Unable to cache '+str(filename)+': '+str(e))
+
+def write_meta_data(meta_file, meta_data):
+    temp_file = meta_file.with_name(meta_file.name+'.tmp')
+    with temp_file.open('w') as fw:
+        json.dump(meta_data, fw)
+    os.replace(temp_file, meta_file)
@@ -0,0 +1,60 @@
+"""Worker process scaling benchmark: python -m benchmarks.batch_scaling
+"""
+from pathlib import Path
+import os
+import time
+
+from MassyTools.bin.isotope_pattern_cache import IsotopePatternCache
+from MassyTools.bin.output_parameters import OUTPUT_FIELDS, OutputParameterValues
+from MassyTools.bin.settings import Settings
+from MassyTools.util.batch_worker import BatchWorker, process_files
+from MassyTools.util.functions import get_peak_list, read_building_blocks
+
+DATA_FOLDER = Path('demo data')
+CALIBRATION_FILE = DATA_FOLDER / 'calibrants.txt'
+QUANTITATION_FILE = DATA_FOLDER / 'analytes.txt'
+
+
+def get_worker():
+    settings = Settings()
+    building_blocks = read_building_blocks(Path('blocks'))
+    output_parameters = OutputParameterValues()
+    for name in OUTPUT_FIELDS:
+        getattr(output_parameters, name).set(int(name != 'pdf_report'))
+    return BatchWorker(settings, building_blocks,
+                       IsotopePatternCache(building_blocks),
+                       output_parameters, get_peak_list(CALIBRATION_FILE),
+                       get_peak_list(QUANTITATION_FILE))
+
+
+def main():
+    files = sorted(DATA_FOLDER.glob('*.xy'))
+    batch_worker = get_worker()
+
+    # Warm up the spectrum and isotopic pattern caches, which are
+    # copied to every worker process
+    list(process_files(batch_worker, files))
+
+    counts = [1]
+    while counts[-1]*2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1]*2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count() or 1)
+
+    print('{} files, {} cores'.format(len(files), os.cpu_count()))
+    print('{:>10}{:>12}{:>12}{:>12}'.format(
+          'Processes', 'Time [s]', 'Speed-up', 'Efficiency'))
+    reference = None
+    for processes in counts:
+        start = time.perf_counter()
+        list(process_files(batch_worker, files, processes))
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = elapsed
+        print('{:>10}{:>12.3f}{:>12.2f}{:>12.2f}'.format(
+              processes, elapsed, reference / elapsed,
+              reference / elapsed / processes))
+
+
+if __name__ == '__main__':
+    main()
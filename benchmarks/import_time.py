@@ -0,0 +1,56 @@
+"""Import time budget check: python -m benchmarks.import_time
+"""
+import subprocess
+import sys
+
+# Budget in seconds of the cumulative import time per module
+BUDGETS = {
+    'MassyTools.cli': 0.5,
+    'MassyTools.util.batch_process': 0.5,
+    'MassyTools.bin.mass_spectrum': 0.5,
+}
+DEFERRED_MODULES = ['matplotlib', 'pkg_resources', 'scipy', 'sklearn',
+                    'tkinter']
+REPEATS = 3
+TOP_IMPORTS = 10
+
+
+def measure(module):
+    """Return the import time, the imports and the deferred modules loaded.
+    """
+    code = ('import sys, '+module+'; print(",".join(name for name in '+
+            repr(DEFERRED_MODULES)+' if name in sys.modules))')
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                              code], capture_output=True, text=True,
+                             check=True)
+    total = None
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(self_time) / 1e6, name.strip()))
+        if name.strip() == module:
+            total = int(cumulative) / 1e6
+    loaded = [name for name in process.stdout.strip().split(',') if name]
+    return total, imports, loaded
+
+
+def main():
+    failed = False
+    for module, budget in BUDGETS.items():
+        runs = [measure(module) for _ in range(REPEATS)]
+        total, imports, loaded = min(runs, key=lambda run: run[0])
+        status = 'ok' if total <= budget and not loaded else 'FAILED'
+        failed = failed or status != 'ok'
+        print('{:<34}{:>9.3f} s (budget {:.3f} s) {}'.format(
+              module, total, budget, status))
+        if loaded:
+            print('  deferred modules loaded: '+', '.join(loaded))
+        for self_time, name in sorted(imports, reverse=True)[:TOP_IMPORTS]:
+            print('  {:>9.3f} s  {}'.format(self_time, name))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
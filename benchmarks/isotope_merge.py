@@ -0,0 +1,81 @@
+"""Isotopic pattern merge benchmark: python -m benchmarks.isotope_merge
+"""
+from pathlib import Path
+from types import SimpleNamespace
+import timeit
+
+from MassyTools.bin.analyte import Analyte
+from MassyTools.bin.isotope_pattern_cache import IsotopePatternCache
+from MassyTools.bin.settings import Settings
+from MassyTools.util.functions import get_peak_list, read_building_blocks
+
+PEAK_LISTS = [Path('demo data') / 'analytes.txt',
+              Path('demo data') / 'calibrants.txt']
+CHARGES = [1, 2, 3]
+REPEATS = 5
+
+
+def legacy_merge_isotopic_pattern(distributions, epsilon):
+    results = []
+    newdata = {d: True for d in distributions}
+    for k, v in distributions:
+        if not newdata[(k, v)]: continue
+        newdata[(k, v)] = False
+        # use each piece of data only once
+        keys, values = [k*v], [v]
+        for kk, vv in [d for d in distributions if newdata[d]]:
+            if abs(k-kk) < epsilon:
+                keys.append(kk*vv)
+                values.append(vv)
+                newdata[(kk, vv)] = False
+        results.append((sum(keys)/sum(values), sum(values)))
+    return results
+
+
+def get_analyte(name, charge, settings, building_blocks):
+    master = SimpleNamespace(settings=settings, process_parameters=None,
+                             building_blocks=building_blocks,
+                             isotope_cache=IsotopePatternCache(
+                                 building_blocks),
+                             peak={'name': name}, charge=charge)
+    analyte = Analyte(master)
+    analyte.attach_charge_carriers(analyte.calculate_neutral_distribution())
+    return analyte
+
+
+def main():
+    settings = Settings()
+    building_blocks = read_building_blocks(Path('blocks'))
+    names = []
+    for peak_list in PEAK_LISTS:
+        names.extend(peak['name'] for peak in get_peak_list(peak_list))
+
+    print('{:<14}{:>4}{:>8}{:>14}{:>14}{:>10}'.format(
+          'Analyte', 'z', 'Peaks', 'Legacy [ms]', 'Current [ms]',
+          'Speed-up'))
+    legacy_total = 0.
+    current_total = 0.
+    for name in names:
+        for charge in CHARGES:
+            analyte = get_analyte(name, charge, settings, building_blocks)
+            masses, fractions = analyte.distributions
+            distributions = list(zip(masses.tolist(), fractions.tolist()))
+
+            legacy = min(timeit.repeat(
+                lambda: legacy_merge_isotopic_pattern(distributions,
+                                                      settings.epsilon),
+                number=1, repeat=REPEATS))
+            current = min(timeit.repeat(
+                analyte.merge_isotopic_pattern, number=1, repeat=REPEATS))
+            legacy_total += legacy
+            current_total += current
+            print('{:<14}{:>4}{:>8}{:>14.3f}{:>14.3f}{:>10.1f}'.format(
+                  name, charge, len(distributions), legacy*1000,
+                  current*1000, legacy / current))
+    print('{:<26}{:>14.3f}{:>14.3f}{:>10.1f}'.format(
+          'Total', legacy_total*1000, current_total*1000,
+          legacy_total / current_total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+
+from MassyTools.util.baseline import rolling_minimum
+
+
+@pytest.mark.parametrize('window', [1, 2, 3, 10, 51, 200, 1001])
+def test_rolling_minimum(window):
+    y_data = np.random.default_rng(window).normal(0., 1., 500)
+    half_window = window // 2
+    expected = [min(y_data[max(index-half_window, 0):index+half_window+1])
+                for index in range(len(y_data))]
+    assert np.array_equal(rolling_minimum(y_data, window), expected)
@@ -0,0 +1,42 @@
+from math import comb
+
+import numpy as np
+import pytest
+
+from MassyTools.bin import elemental_abundances
+from MassyTools.util.functions import calculate_elemental_isotopic_pattern
+
+
+def get_binomial_distribution(element, number, min_contribution):
+    masses = []
+    fractions = []
+    for _, abundance, mass_increment in element:
+        previous = None
+        for j in range(number+1):
+            fraction = (comb(number, j) * abundance**j *
+                        (1-abundance)**(number-j))
+            masses.append(mass_increment*j)
+            fractions.append(fraction)
+            if (previous is not None and fraction <= min_contribution and
+                    fraction < previous):
+                break
+            previous = fraction
+    return masses, fractions
+
+@pytest.mark.parametrize('element, number', [
+    (elemental_abundances.carbon, 0),
+    (elemental_abundances.carbon, 1),
+    (elemental_abundances.carbon, 60),
+    (elemental_abundances.carbon, 300),
+    (elemental_abundances.hydrogen, 500),
+    (elemental_abundances.sulfur34, 8),
+])
+@pytest.mark.parametrize('min_contribution', [0.0001, 1e-8])
+def test_calculate_elemental_isotopic_pattern(element, number,
+                                              min_contribution):
+    masses, fractions = calculate_elemental_isotopic_pattern(
+            element, number, min_contribution)
+    expected_masses, expected_fractions = get_binomial_distribution(
+            element, number, min_contribution)
+    assert np.allclose(masses, expected_masses, rtol=1e-12, atol=0.)
+    assert np.allclose(fractions, expected_fractions, rtol=1e-10, atol=0.)
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from MassyTools.bin.mass_spectrum import MassSpectrum
+from MassyTools.bin.settings import Settings
+
+
+def get_mass_spectrum(x_data, y_data):
+    master = SimpleNamespace(settings=Settings(), process_parameters=None,
+                             building_blocks=None, isotope_cache=None,
+                             axes=None, filename=None)
+    mass_spectrum = MassSpectrum(master)
+    mass_spectrum.x_data = x_data
+    mass_spectrum.y_data = y_data
+    return mass_spectrum
+
+def test_quantify_windows():
+    rng = np.random.default_rng(0)
+    x_data = np.cumsum(rng.uniform(0.01, 0.02, 1000)) + 1000.
+    y_data = rng.exponential(100., 1000)
+    mass_spectrum = get_mass_spectrum(x_data, y_data)
+
+    left_indices = rng.integers(0, 1000, 500)
+    right_indices = np.minimum(left_indices + rng.integers(0, 300, 500), 1000)
+    areas, totals, maxima = mass_spectrum.quantify_windows(left_indices,
+                                                           right_indices)
+
+    for index, (left, right) in enumerate(zip(left_indices, right_indices)):
+        if left == right:
+            assert totals[index] == 0.
+            assert areas[index] == 0.
+            assert np.isnan(maxima[index])
+            continue
+        total = sum(y_data[left:right])
+        spacing = (x_data[right-1] - x_data[left]) / (right - left)
+        assert np.isclose(totals[index], total)
+        assert np.isclose(areas[index], total*spacing)
+        assert maxima[index] == max(y_data[left:right])
+
+def test_quantify_windows_replaced_data():
+    x_data = np.arange(10.)
+    mass_spectrum = get_mass_spectrum(x_data, np.arange(10.))
+    mass_spectrum.quantify_windows([0], [10])
+
+    mass_spectrum.y_data = np.arange(10.)[::-1].copy()
+    _, totals, maxima = mass_spectrum.quantify_windows([5], [10])
+    assert totals[0] == 10.
+    assert maxima[0] == 4.
@@ -0,0 +1,68 @@
+from pathlib import Path
+import shutil
+
+import pytest
+
+from MassyTools import cli
+from MassyTools.util.shards import parse_shard, select_shard
+
+DEMO_FOLDER = Path(__file__).resolve().parent.parent / 'demo data'
+DEMO_FILES = ['A1_0_A1_1.xy', 'A2_0_A2_1.xy', 'A3_0_A3_1.xy']
+
+
+def test_parse_shard():
+    assert parse_shard('2/3') == (2, 3)
+    for specification in ['0/3', '4/3', '1/0', '1', 'a/b']:
+        with pytest.raises(ValueError):
+            parse_shard(specification)
+
+def test_select_shard():
+    files = ['c.xy', 'a.xy', 'e.xy', 'b.xy', 'd.xy']
+    assert select_shard(files) == ['a.xy', 'b.xy', 'c.xy', 'd.xy', 'e.xy']
+    assert select_shard(files, (1, 2)) == ['a.xy', 'c.xy', 'e.xy']
+    assert select_shard(files, (2, 2)) == ['b.xy', 'd.xy']
+
+def run_batch(data_folder, *arguments):
+    return cli.main(['--data-folder', str(data_folder),
+                     '--calibration-file', str(DEMO_FOLDER / 'calibrants.txt'),
+                     '--analyte-file', str(DEMO_FOLDER / 'analytes.txt'),
+                     '--output', 'absolute_intensity',
+                     '--output', 'background_subtraction',
+                     '--output', 'analyte_quality_criteria',
+                     '--output', 'spectral_quality_criteria',
+                     '--isotope-library', '', '--quiet', *arguments])
+
+def test_merge_partial_files(tmp_path, monkeypatch):
+    # Use the default settings instead of a MassyTools.ini
+    monkeypatch.chdir(tmp_path)
+    data_folder = tmp_path / 'data'
+    data_folder.mkdir()
+    for filename in DEMO_FILES:
+        shutil.copy(DEMO_FOLDER / filename, data_folder)
+
+    assert run_batch(data_folder) == cli.EXIT_SUCCESS
+    summary_file, = data_folder.glob('*_summary.txt')
+
+    for shard in ['1/2', '2/2']:
+        assert run_batch(data_folder, '--shard', shard) == cli.EXIT_SUCCESS
+    partial_files = [str(partial_file) for partial_file in
+                     data_folder.glob('MassyTools_shard_*_of_2.json')]
+    assert len(partial_files) == 2
+    merged_file = tmp_path / 'merged.txt'
+    assert cli.main(['--merge', *partial_files, '--summary-file',
+                     str(merged_file)]) == cli.EXIT_SUCCESS
+
+    summary = summary_file.read_text()
+    assert all(Path(filename).stem in summary for filename in DEMO_FILES)
+    assert merged_file.read_text() == summary
+
+def test_merge_missing_shard(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data_folder = tmp_path / 'data'
+    data_folder.mkdir()
+    shutil.copy(DEMO_FOLDER / DEMO_FILES[0], data_folder)
+
+    assert run_batch(data_folder, '--shard', '1/2') == cli.EXIT_SUCCESS
+    partial_file = data_folder / 'MassyTools_shard_1_of_2.json'
+    assert cli.main(['--merge', str(partial_file), '--summary-file',
+                     str(tmp_path / 'merged.txt')]) == cli.EXIT_ERRORS